@@ -0,0 +1,157 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Benchmark suite of the models of the repository.
+
+    Runs every model headless along a ladder of grid sizes and numbers of
+    agents, and reports steps per second, per-step latency percentiles and
+    peak RSS of each case. The first run (or a run with --save) saves the
+    results in baseline.json, the next runs are compared against it and
+    the script exits with 1 when a metric regresses more than its
+    threshold (COMMON/Benchmark.py THRESHOLDS).
+
+        python benchmark.py           Compare against the baseline
+        python benchmark.py --save    Save the results as the new baseline
+
+'''
+
+# Imports
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "INTEGRAL_ACTIVITY - PREY_DEPREDATOR_MODEL"))
+sys.path.append(os.path.join(ROOT, "M1_ACTIVITY"))
+sys.path.append(os.path.join(ROOT, "EXAMPLES_IN_CLASS"))
+
+from COMMON.Benchmark import run_suite, compare, save_baseline, load_baseline
+from COMMON.Benchmark import format_result, format_comparison, THRESHOLDS
+
+STEPS = 30  # Timed steps of each case
+WARMUP = 3  # Steps before the timed ones
+REPEATS = 3  # Runs of each case (the fastest one is kept)
+SEED = 0  # Seed of every model
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baseline.json")
+
+# The models are imported inside the factories, so the process of each case
+# only loads (and counts in its RSS) the model that it runs.
+
+
+def cenitune(size, engine, animation=False, tiles=None):
+    from System.Model import Cenitune
+    # Same density of agents as the default planet (35 x 35, 47 + 15)
+    scale = size * size / (35 * 35)
+    recorder = None
+    if animation:
+        # The GIF of main.py, encoded but thrown away: the time that the
+        # animation adds to each step
+        from COMMON.Animation import GifSink
+        recorder = GifSink(os.devnull, {0: (255, 255, 255), 3: (102, 102, 102),
+                                        5: (0, 0, 0)}, fps=10, scale=6)
+    return Cenitune(width=size, height=size,
+                    initial_nonines=round(47 * scale),
+                    initial_deddians=round(15 * scale),
+                    engine=engine, recorder=recorder, seed=SEED, tiles=tiles)
+
+
+def robot_vacuum_cleaner(size, robots, vectorized=False, strategy="random"):
+    from SYSTEM.Model import RobotVacuumCleanerModel
+    return RobotVacuumCleanerModel(size, size, robots, flag=True, seed=SEED,
+                                   vectorized=vectorized, strategy=strategy)
+
+
+def robot_vacuum_ensemble(size, robots, replicas):
+    from SYSTEM.Ensemble import RobotVacuumEnsemble
+    return RobotVacuumEnsemble(replicas, size, size, robots, flag=True,
+                               seed=SEED)
+
+
+def robot_vacuum_cleaner_example(size, robots):
+    from Example01 import RobotVacuumCleanerModel
+    return RobotVacuumCleanerModel(size, size, robots, seed=SEED)
+
+
+def money(agents):
+    from Example02 import MoneyModel
+    return MoneyModel(agents, seed=SEED)
+
+
+def game_life(size):
+    from Example03 import GameLifeModel
+    return GameLifeModel(size, size, seed=SEED)
+
+
+def flock(agents):
+    from Example04 import FlockModel
+    return FlockModel(1000, 1000, agents, seed=SEED)
+
+
+def segregation(size, scheduler="random"):
+    from Example05 import SegregationModel
+    return SegregationModel(size, size, 2, 0.6, 0.2, seed=SEED,
+                            scheduler=scheduler)
+
+
+CASES = (
+    [("Cenitune[object]", cenitune, {"size": size, "engine": "object"})
+     for size in (20, 35, 70, 140)] +
+    [("Cenitune[array]", cenitune, {"size": size, "engine": "array"})
+     for size in (20, 35, 70, 140, 280)] +
+    [("Cenitune[color]", cenitune, {"size": size, "engine": "color"})
+     for size in (20, 35, 70, 140, 280)] +
+    # The peak RSS of the tiled cases is the one of the coordinator (the
+    # shared lattices and floor), the workers are other processes
+    [("Cenitune[tiled]", cenitune,
+      {"size": size, "engine": "tiled", "tiles": tiles})
+     for tiles in (1, 2, 4) for size in (140, 280, 500, 1000, 2000)] +
+    [("Cenitune[array+gif]", cenitune,
+      {"size": size, "engine": "array", "animation": True})
+     for size in (35, 70, 140)] +
+    [("RobotVacuumCleanerModel", robot_vacuum_cleaner,
+      {"size": size, "robots": robots})
+     for size, robots in ((10, 1), (20, 10), (40, 50), (80, 200))] +
+    [("RobotVacuumCleanerModel[vectorized]", robot_vacuum_cleaner,
+      {"size": size, "robots": robots, "vectorized": True})
+     for size, robots in ((80, 200), (250, 2000), (500, 10000))] +
+    [("RobotVacuumCleanerModel[%s]" % strategy, robot_vacuum_cleaner,
+      {"size": size, "robots": robots, "vectorized": True,
+       "strategy": strategy})
+     for strategy in ("nearest", "sweep")
+     for size, robots in ((80, 200), (250, 2000))] +
+    [("RobotVacuumEnsemble", robot_vacuum_ensemble,
+      {"size": size, "robots": robots, "replicas": replicas})
+     for size, robots, replicas in ((20, 10, 100), (40, 50, 100),
+                                    (80, 200, 50))] +
+    [("RobotVacuumCleanerModel[Example01]", robot_vacuum_cleaner_example,
+      {"size": size, "robots": robots})
+     for size, robots in ((10, 1), (20, 10), (40, 50))] +
+    [("MoneyModel", money, {"agents": agents}) for agents in (10, 100, 500)] +
+    [("GameLifeModel", game_life, {"size": size}) for size in (25, 50, 100)] +
+    [("FlockModel", flock, {"agents": agents}) for agents in (25, 50, 100)] +
+    [("SegregationModel", segregation, {"size": size})
+     for size in (20, 30, 50)] +
+    [("SegregationModel[color]", segregation,
+      {"size": size, "scheduler": "color"}) for size in (20, 30, 50)]
+)
+
+
+if __name__ == "__main__":
+    results = run_suite(CASES, STEPS, WARMUP, REPEATS,
+                        callback=lambda result: print(format_result(result)))
+
+    if "--save" in sys.argv or not os.path.exists(BASELINE):
+        save_baseline(BASELINE, results)
+        print("Baseline saved in", BASELINE)
+        sys.exit(0)
+
+    rows = compare(load_baseline(BASELINE), results, THRESHOLDS)
+    print()
+    for row in rows:
+        print(format_comparison(row))
+    regressions = [row for row in rows if row[-1]]
+    print()
+    print("Regressions: %d / %d metrics" % (len(regressions), len(rows)))
+    sys.exit(1 if regressions else 0)
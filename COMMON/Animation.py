@@ -0,0 +1,185 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Streaming animation sinks.
+
+    A sink receives the grid of each step (same record interface as the
+    recorders, so it can be passed as the recorder of a model) and encodes
+    it on a background thread while the simulation keeps running. Only the
+    frames waiting in the queue are kept in memory. The encoders run in C
+    (Pillow, zlib) and release the GIL, so the encoding overlaps with the
+    steps of the model.
+
+        - GifSink: Palette-indexed animated GIF (LZW of Pillow)
+        - NpzSink: Raw frames appended to a .npz file
+
+'''
+
+# Imports
+import queue
+import threading
+import zipfile
+import numpy as np
+from PIL import Image
+
+'''
+    FrameSink
+
+    Base class of the sinks, subclasses implement write(frame) and finish().
+
+    Parameters:
+        - queue_size: Maximum number of frames waiting to be encoded
+
+    Atributes:
+        - count: Number of frames received
+        - error: Exception raised by the encoding thread (if any)
+
+'''
+
+
+class FrameSink:
+    def __init__(self, queue_size=2):
+        self.queue = queue.Queue(queue_size)
+        self.count = 0
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(np.array(frame, copy=True))
+        self.count += 1
+
+    def run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                return
+            if self.error is None:
+                try:
+                    self.write(frame)
+                except Exception as error:
+                    self.error = error
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is None:
+            self.finish()
+        if self.error is not None:
+            raise self.error
+
+    def write(self, frame):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+'''
+    GifSink
+
+    Parameters:
+        - path: Path of the GIF file
+        - palette: Color (r, g, b) of each cell code, {code: (r, g, b)}
+        - fps: Frames per second of the animation
+        - scale: Size in pixels of each cell
+        - loop: Number of loops of the animation (0 forever)
+        - queue_size: Maximum number of frames waiting to be encoded
+
+'''
+
+
+class GifSink(FrameSink):
+    def __init__(self, path, palette, fps=10, scale=1, loop=0, queue_size=2):
+        codes = max(palette) + 1
+        self.depth = max(1, int(np.ceil(np.log2(max(codes, 2)))))
+        self.colors = np.zeros((1 << self.depth, 3), dtype=np.uint8)
+        for code, color in palette.items():
+            self.colors[code] = color
+
+        self.delay = max(1, int(round(100 / fps)))
+        self.scale = scale
+        self.loop = loop
+        self.file = open(path, "wb")
+        self.shape = None
+        super().__init__(queue_size)
+
+    def write(self, frame):
+        frame = np.asarray(frame).astype(np.uint8)
+        if self.scale > 1:
+            frame = frame.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+
+        if self.shape is None:
+            self.shape = frame.shape
+            self.write_header()
+
+        height, width = frame.shape
+        self.file.write(b"\x21\xf9\x04\x00" + le16(self.delay) + b"\x00\x00")
+        self.file.write(b"\x2c" + le16(0) + le16(0) + le16(width) +
+                        le16(height) + b"\x00")
+        # Image data: minimum code size 8, LZW sub-blocks and terminator
+        self.file.write(b"\x08")
+        self.file.write(Image.fromarray(frame, "P").tobytes("gif", "P"))
+        self.file.write(b"\x00")
+
+    def write_header(self):
+        height, width = self.shape
+        self.file.write(b"GIF89a" + le16(width) + le16(height))
+        self.file.write(bytes([0x80 | ((self.depth - 1) << 4) |
+                               (self.depth - 1), 0, 0]))
+        self.file.write(self.colors.tobytes())
+        self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" +
+                        le16(self.loop) + b"\x00")
+
+    def finish(self):
+        self.file.write(b"\x3b")
+        self.file.close()
+
+
+'''
+    NpzSink
+
+    Parameters:
+        - path: Path of the .npz file (frame_000000, frame_000001, ...)
+        - compress: Compress the frames (zip deflate)
+        - queue_size: Maximum number of frames waiting to be encoded
+
+'''
+
+
+class NpzSink(FrameSink):
+    def __init__(self, path, compress=True, queue_size=2):
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self.zip = zipfile.ZipFile(path, "w", compression)
+        self.written = 0
+        super().__init__(queue_size)
+
+    def write(self, frame):
+        with self.zip.open("frame_%06d.npy" % self.written, "w",
+                           force_zip64=True) as file:
+            np.lib.format.write_array(file, np.asarray(frame))
+        self.written += 1
+
+    def finish(self):
+        self.zip.close()
+
+
+def le16(value):
+    return int(value).to_bytes(2, "little")
+
@@ -0,0 +1,219 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Benchmark harness of the models.
+
+    A case builds a model with a factory (function parameters -> model),
+    runs some warm-up steps and then times each step alone (no animation,
+    no plots). Every run of a case is a new process, so the peak RSS of the
+    process is the one of that model only. Each case is run several times
+    and the fastest run is kept (the slower ones measure the noise of the
+    machine, not the model).
+
+    The results are saved as a JSON baseline, and the results of the next
+    runs are compared against it: a metric that gets worse by more than
+    its threshold (relative change) is a regression. Each run also times a
+    fixed workload (calibrate) and the times are scaled by the change of
+    that time, so a machine that is busier or slower than the one of the
+    baseline does not look like a regression of the models.
+
+'''
+
+# Imports
+import json
+import multiprocessing
+import platform
+import sys
+import time
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Metrics of each case where a larger value is better
+HIGHER_IS_BETTER = ("steps_per_second",)
+
+# Metrics of each case measured in time (scaled by the calibration)
+TIMES = ("steps_per_second", "p50", "p90", "p99", "max")
+
+# Maximum relative worsening of each metric before it is a regression
+THRESHOLDS = {"steps_per_second": 0.15, "p50": 0.2, "p99": 0.3,
+              "peak_rss": 0.2}
+
+
+def calibrate(repeats=5):
+    '''
+        Best time of a fixed workload (Python loop and NumPy operations),
+        a measure of the speed of the machine at the time of the run.
+    '''
+    best = float("inf")
+    values = np.arange(100000, dtype=np.float64)
+    for _ in range(repeats):
+        start = time.perf_counter()
+        total = 0
+        for value in range(100000):
+            total += value % 7
+        np.sort(np.sin(values))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes in Linux, bytes in macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def case_key(case):
+    parameters = ",".join("%s=%s" % (name, value)
+                          for name, value in sorted(case["parameters"].items()))
+    return "%s(%s)" % (case["name"], parameters)
+
+
+def measure(task):
+    name, factory, parameters, steps, warmup = task
+    calibration = calibrate()
+    start = time.perf_counter()
+    model = factory(**parameters)
+    setup = time.perf_counter() - start
+
+    for _ in range(warmup):
+        model.step()
+
+    latencies = np.zeros(steps)
+    for step in range(steps):
+        start = time.perf_counter()
+        model.step()
+        latencies[step] = time.perf_counter() - start
+
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99))
+    return {"name": name,
+            "parameters": parameters,
+            "steps": steps,
+            "setup": setup,
+            "steps_per_second": steps / latencies.sum(),
+            "p50": p50,
+            "p90": p90,
+            "p99": p99,
+            "max": latencies.max(),
+            "peak_rss": peak_rss(),
+            "calibration": calibration}
+
+
+def send_measure(connection, task):
+    try:
+        connection.send(measure(task))
+    except Exception as error:
+        connection.send(error)
+        raise
+    finally:
+        connection.close()
+
+
+def run_process(context, task):
+    '''
+        Runs measure(task) in a new process. The process is not a daemon (as
+        the workers of a Pool), so the model can start its own processes
+        (the tiled engine of Cenitune).
+    '''
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=send_measure, args=(sender, task))
+    process.start()
+    sender.close()
+    result = receiver.recv()
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+'''
+    Parameters:
+        - cases: Cases of the suite, (name, factory, parameters)
+        - steps: Number of timed steps of each case
+        - warmup: Number of steps before the timed ones
+        - repeats: Number of runs of each case (the fastest one is kept)
+        - callback: Function called with each result
+
+    Returns the result of each case (one process per run, one at a time),
+    with the largest peak RSS of its runs.
+'''
+
+
+def run_suite(cases, steps=30, warmup=3, repeats=3, callback=None):
+    tasks = [(name, factory, parameters, steps, warmup)
+             for name, factory, parameters in cases]
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for task in tasks:
+        runs = [run_process(context, task) for _ in range(repeats)]
+        result = max(runs, key=lambda run: run["steps_per_second"])
+        if result["peak_rss"] is not None:
+            result["peak_rss"] = max(run["peak_rss"] for run in runs)
+        result["repeats"] = repeats
+        results.append(result)
+        if callback is not None:
+            callback(result)
+    return results
+
+
+def compare(baseline, results, thresholds=THRESHOLDS):
+    '''
+        Returns a row (key, metric, old, new, change, regression) for each
+        metric of the cases that are in the baseline and in the results,
+        with the new times scaled to the speed of the baseline machine.
+    '''
+    previous = {case_key(case): case for case in baseline["results"]}
+    rows = []
+    for case in results:
+        key = case_key(case)
+        if key not in previous:
+            continue
+        # > 1 when the machine is slower than in the baseline
+        speed = 1.0
+        if previous[key].get("calibration") and case.get("calibration"):
+            speed = case["calibration"] / previous[key]["calibration"]
+
+        for metric, threshold in thresholds.items():
+            old = previous[key].get(metric)
+            new = case.get(metric)
+            if not old or new is None:
+                continue
+            if metric in TIMES:
+                new = new * speed if metric in HIGHER_IS_BETTER else new / speed
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append((key, metric, old, new, change, worse > threshold))
+    return rows
+
+
+def save_baseline(path, results):
+    with open(path, "w") as file:
+        json.dump({"machine": {"platform": platform.platform(),
+                               "processor": platform.processor(),
+                               "python": platform.python_version(),
+                               "numpy": np.__version__},
+                   "results": results}, file, indent=2)
+
+
+def load_baseline(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def format_result(result):
+    rss = result["peak_rss"]
+    return "%-70s %9.1f steps/s  p50 %8.2f ms  p99 %8.2f ms  RSS %s" % (
+        case_key(result), result["steps_per_second"], result["p50"] * 1000,
+        result["p99"] * 1000, "-" if rss is None else "%.1f MB" % (rss / 2**20))
+
+
+def format_comparison(row):
+    key, metric, old, new, change, regression = row
+    return "%-70s %-16s %12.4g -> %12.4g (%+6.1f%%)%s" % (
+        key, metric, old, new, change * 100, "  REGRESSION" if regression else "")
@@ -0,0 +1,103 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Content-addressed cache of simulation results.
+
+    The results of a run (time series, frames, ... as NumPy arrays) are
+    stored in a .npz file named by the hash of (model class, parameters,
+    seed, code version), so a run that was already computed is read from
+    disk instead of simulated again. The code version is the hash of the
+    source files of the package of the model and of COMMON: any change of
+    the code gives new keys. A run without seed (seed None) is not
+    reproducible, so it is never read from nor saved in the cache.
+
+'''
+
+# Imports
+import hashlib
+import inspect
+import json
+import os
+import numpy as np
+
+
+# Directory of the shared code (COMMON), used by every model
+COMMON = os.path.dirname(os.path.abspath(__file__))
+
+
+def code_version(Model):
+    directory = os.path.dirname(os.path.abspath(inspect.getfile(Model)))
+    digest = hashlib.sha256()
+    for directory in (directory, COMMON):
+        digest.update(os.path.basename(directory).encode())
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".py"):
+                digest.update(name.encode())
+                with open(os.path.join(directory, name), "rb") as file:
+                    digest.update(file.read())
+    return digest.hexdigest()
+
+
+'''
+    ResultCache
+
+    Parameters:
+        - directory: Directory of the cached results
+
+    Atributes:
+        - versions: Code version of each model class (computed once)
+        - hits: Number of results read from the cache
+        - misses: Number of results not found in the cache
+
+'''
+
+
+class ResultCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.versions = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, Model, parameters, seed):
+        if Model not in self.versions:
+            self.versions[Model] = code_version(Model)
+        content = json.dumps({"model": Model.__module__ + "." + Model.__qualname__,
+                              "parameters": parameters,
+                              "seed": seed,
+                              "version": self.versions[Model]},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def path(self, Model, parameters, seed):
+        return os.path.join(self.directory,
+                            self.key(Model, parameters, seed) + ".npz")
+
+    def get(self, Model, parameters, seed):
+        if seed is None:
+            return None
+        path = self.path(Model, parameters, seed)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    def put(self, Model, parameters, seed, arrays):
+        if seed is None:
+            return
+        path = self.path(Model, parameters, seed)
+        temporary = path + ".%d.tmp.npz" % os.getpid()
+        np.savez_compressed(temporary, **arrays)
+        os.replace(temporary, path)
+
+    def run(self, Model, parameters, seed, simulate):
+        result = self.get(Model, parameters, seed)
+        if result is None:
+            result = simulate(Model, parameters, seed)
+            self.put(Model, parameters, seed, result)
+        return result
@@ -0,0 +1,157 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Binary checkpoints of the simulations.
+
+    A checkpoint is a .npz file with the state of a model as NumPy arrays
+    (grid, agents, floor, ...) and a JSON document with the scalars
+    (parameters, counters, states of the random generators, ...). Each
+    model gives a function model -> (arrays, metadata) and a function
+    (arrays, metadata) -> model that rebuilds it exactly, so the Mesa
+    objects are never pickled.
+
+    CheckpointWriter takes the snapshot of the state on the simulation
+    thread (copies of the arrays) and writes the file on a background
+    thread, so the simulation only waits for the copies.
+
+'''
+
+# Imports
+import json
+import os
+import queue
+import threading
+import numpy as np
+
+
+def save(path, arrays, metadata, compress=False):
+    '''
+        Writes the checkpoint atomically: a crash while writing leaves the
+        previous checkpoint of the same path untouched.
+    '''
+    temporary = path + ".%d.tmp.npz" % os.getpid()
+    write = np.savez_compressed if compress else np.savez
+    write(temporary, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(temporary, path)
+
+
+def load(path):
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files if name != "metadata"}
+        metadata = json.loads(str(data["metadata"]))
+    return arrays, metadata
+
+
+def random_state(random):
+    '''
+        State of a random.Random (Mersenne Twister) as an array and scalars.
+    '''
+    version, internal, gauss_next = random.getstate()
+    return np.array(internal, dtype=np.uint32), {"version": version,
+                                                 "gauss_next": gauss_next}
+
+
+def set_random_state(random, internal, metadata):
+    random.setstate((metadata["version"], tuple(int(value) for value in internal),
+                     metadata["gauss_next"]))
+
+
+def generator_state(rng):
+    return rng.bit_generator.state
+
+
+def set_generator_state(rng, state):
+    rng.bit_generator.state = state
+
+
+def series_state(datacollector):
+    '''
+        Series of the model reporters of a DataCollector, as arrays.
+    '''
+    names = list(datacollector.model_vars)
+    arrays = {"series_%d" % index: np.asarray(datacollector.model_vars[name])
+              for index, name in enumerate(names)}
+    return arrays, names
+
+
+def set_series_state(datacollector, arrays, names):
+    for index, name in enumerate(names):
+        datacollector.model_vars[name] = arrays["series_%d" % index].tolist()
+
+
+'''
+    CheckpointWriter
+
+    Parameters:
+        - path: Path of the checkpoints, with {step} for one file per
+          checkpoint (a single file overwritten each time otherwise)
+        - every: Number of steps between two checkpoints
+        - get_state: Function model -> (arrays, metadata)
+        - compress: Compress the arrays of the checkpoints
+        - queue_size: Maximum number of checkpoints waiting to be written
+
+    Atributes:
+        - written: Paths of the checkpoints written
+        - error: Exception raised by the writing thread (if any)
+
+'''
+
+
+class CheckpointWriter:
+    def __init__(self, path, every, get_state, compress=False, queue_size=1):
+        if every < 1:
+            raise ValueError("every must be at least 1")
+
+        self.path = path
+        self.every = every
+        self.get_state = get_state
+        self.compress = compress
+        self.written = []
+        self.error = None
+        self.closed = False
+        self.queue = queue.Queue(queue_size)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def step(self, model, steps):
+        '''
+            Called after each step of the model, steps is the number of
+            steps done.
+        '''
+        if steps % self.every == 0:
+            self.write(model, steps)
+
+    def write(self, model, steps):
+        if self.error is not None:
+            raise self.error
+        arrays, metadata = self.get_state(model)
+        self.queue.put((self.path.format(step=steps), arrays, metadata))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                path, arrays, metadata = item
+                try:
+                    save(path, arrays, metadata, self.compress)
+                    self.written.append(path)
+                except Exception as error:
+                    self.error = error
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,45 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Color classes of a lattice for conflict-free batched updates.
+
+    The cells of the lattice are split in classes such that the
+    neighbourhoods (of a given radius) of two cells of the same class never
+    overlap. An agent that only reads and writes the cells of the
+    neighbourhood of its cell can then be updated at the same time as every
+    other agent of its class, as a single batch, with the same result as
+    any sequential order of those agents.
+
+        - von Neumann (Manhattan distance): (x + (2r + 1) y) mod (2r² + 2r + 1),
+          the diamonds of radius r of a class tile the plane (r = 1: 5 classes,
+          r = 2: 13 classes).
+        - Moore (Chebyshev distance): (x mod (2r + 1)) + (2r + 1) (y mod (2r + 1)),
+          (2r + 1)² classes (r = 1: 9 classes).
+
+    The lattice is not a torus: with wrapping, the cells of the borders of
+    the same class could be neighbours.
+
+'''
+
+# Imports
+import numpy as np
+
+
+def color_classes(width, height, radius=1, moore=False):
+    '''
+        Returns (colors, classes): the class of each cell (width x height)
+        and the number of classes.
+    '''
+    if radius < 1:
+        raise ValueError("radius must be at least 1")
+
+    x, y = np.indices((width, height))
+    side = 2 * radius + 1
+    if moore:
+        classes = side * side
+        colors = (x % side) + side * (y % side)
+    else:
+        classes = 2 * radius * radius + 2 * radius + 1
+        colors = (x + side * y) % classes
+    return colors.astype(np.int16), classes
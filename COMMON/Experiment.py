@@ -0,0 +1,158 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Adaptive Monte Carlo experiments.
+
+    Runs seeded replicas of a model for several configurations in a process
+    pool and keeps the running mean and variance of the outcome of each
+    configuration (Welford). A configuration stops being sampled once the
+    confidence interval of its mean is within relative_error of the mean,
+    and the rest of the budget goes to the configurations with the widest
+    intervals, so no replicas are spent on the ones that already converged.
+
+    The seed of each replica only depends on the seed of the experiment,
+    the configuration and the number of the replica, but which replicas
+    are run depends on the order in which the results arrive.
+
+'''
+
+# Imports
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from statistics import NormalDist
+import math
+import os
+import numpy as np
+
+'''
+    RunningStats
+
+    Running mean and variance of a series of values (Welford).
+
+    Atributes:
+        - count: Number of values
+        - mean: Mean of the values
+        - m2: Sum of the squared differences to the mean
+
+'''
+
+
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self):
+        if self.count < 2:
+            return math.inf
+        return self.m2 / (self.count - 1)
+
+    def half_width(self, confidence=0.95):
+        '''
+            Half width of the confidence interval of the mean (normal
+            approximation).
+        '''
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * math.sqrt(self.variance() / max(self.count, 1))
+
+    def relative_width(self, confidence=0.95):
+        half_width = self.half_width(confidence)
+        if half_width == 0:
+            return 0.0
+        if self.mean == 0:
+            return math.inf
+        return half_width / abs(self.mean)
+
+
+def replica_seed(entropy, configuration, replica):
+    return int(np.random.SeedSequence(
+        entropy, spawn_key=(configuration, replica)).generate_state(1)[0])
+
+
+def run_replica(task):
+    function, configuration, seed = task
+    return function(seed=seed, **configuration)
+
+
+'''
+    Parameters:
+        - function: Function run by each replica, function(seed=seed,
+          **configuration) -> outcome (a number), importable by the workers
+        - configurations: Keyword arguments of function of each configuration
+        - budget: Maximum number of replicas of the whole experiment
+        - relative_error: Half width of the confidence interval, relative to
+          the mean, where a configuration converges
+        - confidence: Confidence of the intervals
+        - minimum: Replicas of each configuration before checking it
+        - processes: Number of processes of the pool (all the CPUs if None)
+        - seed: Seed of the experiment (random if None)
+        - callback: Function called with (configuration index, outcome)
+
+    Returns the RunningStats of each configuration.
+'''
+
+
+def adaptive_experiment(function, configurations, budget, relative_error=0.02,
+                        confidence=0.95, minimum=10, processes=None,
+                        seed=None, callback=None):
+    if minimum < 2:
+        raise ValueError("minimum must be at least 2")
+
+    entropy = np.random.SeedSequence(seed).entropy
+    stats = [RunningStats() for _ in configurations]
+    started = [0] * len(configurations)
+    running = [0] * len(configurations)
+    processes = processes or os.cpu_count() or 1
+
+    def converged(index):
+        return (stats[index].count >= minimum and
+                stats[index].relative_width(confidence) <= relative_error)
+
+    def next_configuration():
+        # First the minimum of every configuration, then the widest interval
+        pending = [index for index in range(len(configurations))
+                   if not converged(index)]
+        missing = [index for index in pending if started[index] < minimum]
+        if missing:
+            return min(missing, key=lambda index: started[index])
+        # Wait for the first results of a configuration before adding more
+        pending = [index for index in pending if stats[index].count >= minimum]
+        if not pending:
+            return None
+        return max(pending, key=lambda index: (
+            stats[index].relative_width(confidence) /
+            math.sqrt(1 + running[index] / stats[index].count)))
+
+    spent = 0
+    futures = {}
+    with ProcessPoolExecutor(processes) as pool:
+        while True:
+            while spent < budget and len(futures) < 2 * processes:
+                index = next_configuration()
+                if index is None:
+                    break
+                task = (function, configurations[index],
+                        replica_seed(entropy, index, started[index]))
+                futures[pool.submit(run_replica, task)] = index
+                started[index] += 1
+                running[index] += 1
+                spent += 1
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures.pop(future)
+                running[index] -= 1
+                outcome = future.result()
+                stats[index].add(outcome)
+                if callback is not None:
+                    callback(index, outcome)
+    return stats
@@ -0,0 +1,173 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Compact frame store.
+
+    Preallocates a (steps, width, height) uint8 array for the grids of a
+    model (the cell codes fit in one byte) and keeps one frame every
+    stride steps. The array can live in memory or in a memory-mapped .npy
+    file, and each stored frame is returned as a view (no copies). A model
+    can draw its grid straight in the slot of the frame (draw), without
+    the copy of record.
+
+'''
+
+# Imports
+import numpy as np
+
+'''
+    FrameStore
+
+    Parameters:
+        - steps: Number of steps that will be recorded (capacity of the store)
+        - width, height: Shape of the frames (shape of the first frame if None)
+        - path: Path of the .npy file to memory-map (in memory if None)
+        - stride: Record one of each stride steps
+        - dtype: Type of the stored values
+
+    Atributes:
+        - data: Array (or memory map) with the frames
+        - steps_seen: Number of steps passed to record (or draw)
+
+'''
+
+
+class FrameStore:
+    def __init__(self, steps, width=None, height=None, path=None, stride=1,
+                 dtype=np.uint8):
+        if stride < 1:
+            raise ValueError("stride must be at least 1")
+        if (width is None) != (height is None):
+            raise ValueError("width and height must be given together")
+
+        self.capacity = max(1, -(-steps // stride))
+        self.shape = None
+        self.path = path
+        self.stride = stride
+        self.dtype = np.dtype(dtype)
+        self.data = None
+        self.count = 0
+        self.steps_seen = 0
+
+        if width is not None:
+            self.allocate((width, height))
+
+    def allocate(self, shape):
+        self.shape = shape
+        full_shape = (self.capacity,) + shape
+        if self.path is None:
+            self.data = np.zeros(full_shape, dtype=self.dtype)
+        else:
+            self.data = np.lib.format.open_memmap(
+                self.path, mode="w+", dtype=self.dtype, shape=full_shape)
+
+    def __len__(self):
+        return self.count
+
+    def slot(self, shape):
+        '''
+            Index of the frame of the next step (None if the stride skips
+            it), allocating the store or growing it when it is needed.
+        '''
+        step = self.steps_seen
+        self.steps_seen += 1
+        if step % self.stride != 0:
+            return None
+
+        if self.data is None:
+            self.allocate(tuple(shape))
+        elif tuple(shape) != self.shape:
+            raise ValueError("Frame of shape %s, expected %s" %
+                             (tuple(shape), self.shape))
+
+        if self.count == self.capacity:
+            if self.path is not None:
+                raise ValueError("FrameStore is full (%d frames)" %
+                                 self.capacity)
+            self.capacity *= 2
+            data = np.zeros((self.capacity,) + self.shape, dtype=self.dtype)
+            data[:self.count] = self.data
+            self.data = data
+
+        self.count += 1
+        return self.count - 1
+
+    def record(self, frame):
+        frame = np.asarray(frame)
+        index = self.slot(frame.shape)
+        if index is not None:
+            self.data[index] = frame
+
+    def draw(self, draw, shape):
+        '''
+            Records the frame that draw(out) draws in out, the view of the
+            slot of the frame in the store (no copies).
+        '''
+        index = self.slot(shape)
+        if index is not None:
+            draw(self.view(index))
+
+    def view(self, index):
+        return self.data[index]
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    @property
+    def frames(self):
+        if self.data is None:
+            return np.zeros((0,), dtype=self.dtype)
+        return self.data[:self.count]
+
+    def step_of(self, index):
+        return index * self.stride
+
+    @property
+    def nbytes(self):
+        return 0 if self.data is None else self.data.nbytes
+
+    def flush(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+    def close(self):
+        if self.path is None or self.data is None:
+            return
+
+        self.flush()
+        self.data = None
+        shrink_npy(self.path, self.count)
+
+
+def shrink_npy(path, count):
+    '''
+        Rewrites the header of a .npy file so that it only keeps the first
+        count rows, keeping the same header size (the data does not move).
+    '''
+    with open(path, "r+b") as file:
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(file)
+        else:
+            header = np.lib.format.read_array_header_2_0(file)
+        shape, fortran_order, dtype = header
+        offset = file.tell()
+        if count == shape[0]:
+            return
+
+        header = repr({"descr": np.lib.format.dtype_to_descr(dtype),
+                       "fortran_order": fortran_order,
+                       "shape": (count,) + shape[1:]})
+        prefix = 8 + (2 if version == (1, 0) else 4)
+        header = header.ljust(offset - prefix - 1) + "\n"
+        file.seek(prefix)
+        file.write(header.encode("latin1"))
+        file.truncate(offset + count * int(np.prod(shape[1:])) * dtype.itemsize)
+
+
+def load(path):
+    return np.load(path, mmap_mode="r")
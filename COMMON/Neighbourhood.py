@@ -0,0 +1,156 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Precomputed neighbourhood tables.
+
+    For a grid shape, a torus flag and a neighbourhood (Moore or von
+    Neumann of some radius, or explicit offsets), a table has the flat
+    index (x * height + y) of the neighbours of every cell, pointing to an
+    extra slot (width * height) for the ones outside the grid, and a mask
+    of the valid ones, computed once with NumPy and shared through a cache
+    of the last tables used (MAXIMUM_TABLES).
+    The vectorized engines look up rows of the arrays, the agents ask the
+    tuple of neighbour cells of their cell, so finding the neighbours is a
+    lookup instead of coordinate arithmetic and bounds checks.
+
+'''
+
+# Imports
+from collections import OrderedDict
+import numpy as np
+
+# Tables already built, by (width, height, offsets, torus, include_center),
+# from the least to the most recently used
+TABLES = OrderedDict()
+MAXIMUM_TABLES = 8  # Tables kept in TABLES
+
+
+def neighbourhood_offsets(moore=True, radius=1, include_center=False):
+    '''
+        Offsets (dx, dy) of the neighbourhood, in the order of the cells of
+        grid.get_neighborhood of Mesa on a grid without torus.
+    '''
+    return tuple((dx, dy)
+                 for dx in range(-radius, radius + 1)
+                 for dy in range(-radius, radius + 1)
+                 if (moore or abs(dx) + abs(dy) <= radius) and
+                 (include_center or (dx, dy) != (0, 0)))
+
+
+'''
+    NeighbourhoodTable
+
+    Parameters:
+        - width: Width of the grid
+        - height: Height of the grid
+        - offsets: Offsets (dx, dy) of the neighbours
+        - torus: If True the neighbours wrap around the borders
+        - include_center: If False a cell is never its own neighbour (on
+          a small torus)
+
+    Atributes:
+        - index: Flat index of each neighbour of each cell, (W * H, K)
+          (W * H for the invalid ones, so a flat lattice with one more
+          slot gives their content with np.take)
+        - x, y: Coordinates (int32) of each neighbour of each cell, (W * H, K)
+          (the cell itself for the invalid ones)
+        - valid: Neighbours inside the grid, without repetitions, (W * H, K)
+        - cells, options: Python tuples of the neighbours of each cell
+          (built on the first use), of the valid ones and of all of them
+          (None for the invalid ones)
+
+'''
+
+
+class NeighbourhoodTable:
+    def __init__(self, width, height, offsets, torus=False,
+                 include_center=False):
+        self.width = width
+        self.height = height
+        self.torus = torus
+        self.offsets = np.array(offsets, dtype=np.int64).reshape(-1, 2)
+
+        x = np.repeat(np.arange(width), height)[:, None]
+        y = np.tile(np.arange(height), width)[:, None]
+        nx = x + self.offsets[:, 0]
+        ny = y + self.offsets[:, 1]
+        if torus:
+            nx %= width
+            ny %= height
+            valid = np.ones(nx.shape, dtype=bool)
+        else:
+            valid = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+        nx = np.where(valid, nx, x)
+        ny = np.where(valid, ny, y)
+        index = nx * height + ny
+
+        # Cells reached twice (or the cell itself) on a small torus
+        own = x * height + y
+        if not include_center:
+            valid &= (index != own) | (self.offsets == 0).all(axis=1)
+        for k in range(1, len(self.offsets)):
+            repeated = (index[:, :k] == index[:, k, None]) & valid[:, :k]
+            valid[:, k] &= ~repeated.any(axis=1)
+        self.valid = valid
+        index_type = np.int32 if width * height < 2**31 - 1 else np.int64
+        self.index = np.where(valid, index, width * height).astype(index_type)
+        self.x = nx.astype(np.int32)
+        self.y = ny.astype(np.int32)
+        self.cells = [None] * (width * height)
+        self.options = [None] * (width * height)
+
+    def lookup(self, x, y):
+        '''
+            (x, y, valid) of the neighbours of the cells (x, y), arrays.
+        '''
+        cells = np.asarray(x) * self.height + np.asarray(y)
+        return self.x[cells], self.y[cells], self.valid[cells]
+
+    def neighbour(self, pos, k):
+        '''
+            Neighbour k (offset k) of the cell pos, None if it is not valid.
+        '''
+        cell = pos[0] * self.height + pos[1]
+        options = self.options[cell]
+        if options is None:
+            options = tuple(
+                (x, y) if valid else None for x, y, valid in
+                zip(self.x[cell].tolist(), self.y[cell].tolist(),
+                    self.valid[cell].tolist()))
+            self.options[cell] = options
+        return options[k]
+
+    def neighbours(self, pos):
+        '''
+            Tuple of the valid neighbour cells (x, y) of the cell pos.
+        '''
+        cell = pos[0] * self.height + pos[1]
+        cells = self.cells[cell]
+        if cells is None:
+            cells = tuple((x, y) for x, y, valid in
+                          zip(self.x[cell].tolist(), self.y[cell].tolist(),
+                              self.valid[cell].tolist()) if valid)
+            self.cells[cell] = cells
+        return cells
+
+
+def neighbourhood_table(width, height, moore=True, torus=False, radius=1,
+                        include_center=False, offsets=None):
+    '''
+        Table of the grid (cached), of the Moore or von Neumann
+        neighbourhood of radius, or of the given offsets.
+    '''
+    if offsets is None:
+        offsets = neighbourhood_offsets(moore, radius, include_center)
+    offsets = tuple((int(dx), int(dy)) for dx, dy in offsets)
+    key = (width, height, offsets, torus, include_center)
+    if key in TABLES:
+        TABLES.move_to_end(key)
+        return TABLES[key]
+
+    table = NeighbourhoodTable(width, height, offsets, torus, include_center)
+    TABLES[key] = table
+    if len(TABLES) > MAXIMUM_TABLES:
+        TABLES.popitem(last=False)
+    return table
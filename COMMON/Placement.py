@@ -0,0 +1,28 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Bulk placement of agents and items on a lattice.
+
+    Picks all the cells at once with a single sampling without replacement
+    over the free cells, instead of drawing random cells until a free one
+    comes out: the cost does not depend on the density and asking for more
+    cells than the free ones is an error, not an endless loop.
+
+'''
+
+# Imports
+import numpy as np
+
+
+def sample_cells(rng, free, number):
+    '''
+        Returns (x, y) of number distinct cells among the True cells of the
+        mask free (width x height), picked with the NumPy generator rng.
+    '''
+    cells = np.flatnonzero(free)
+    if number > len(cells):
+        raise ValueError("Not enough free cells: %d > %d" % (number, len(cells)))
+
+    chosen = rng.choice(cells, size=number, replace=False)
+    return np.unravel_index(chosen, free.shape)
@@ -0,0 +1,140 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Per-phase profiler of the simulations.
+
+    The profiler replaces the functions to measure (phases of the step of a
+    model, methods of the agents, functions of a module) with timed
+    wrappers, and keeps the time and number of calls of each stack of
+    names ("step;schedule.step;Nonine.move"). Nothing is replaced until
+    instrument is called and restore puts the original functions back, so
+    a model without a profiler runs its code untouched.
+
+    The calls at the root of the stack (the steps of the model) can also
+    record the allocations of each step with tracemalloc.
+
+    The results are exported as JSON or as collapsed stacks (one
+    "a;b;c microseconds" line per stack, self time), the input format of
+    flamegraph.pl and speedscope.
+
+'''
+
+# Imports
+import functools
+import json
+import time
+import tracemalloc
+
+'''
+    Profiler
+
+    Parameters:
+        - memory: Record the allocations of each root call (tracemalloc)
+
+    Atributes:
+        - total: Time (ns) of each stack, including its children
+        - children: Time (ns) of the children of each stack
+        - calls: Number of calls of each stack
+        - steps: Number of root calls (steps of the model)
+        - allocations: (allocated, peak) bytes of each root call
+
+'''
+
+
+class Profiler:
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.total = {}
+        self.children = {}
+        self.calls = {}
+        self.steps = 0
+        self.allocations = []
+        self.stack = []
+        self.patched = []
+        self.started_tracing = False
+        self.traced = 0
+
+    def instrument(self, owner, names, prefix=None):
+        '''
+            Replaces the attributes names of owner (class, module or
+            instance) with timed wrappers, named prefix.name.
+        '''
+        for name in names:
+            own = name in vars(owner)
+            self.patched.append((owner, name, vars(owner).get(name), own))
+            label = name if prefix is None else "%s.%s" % (prefix, name)
+            setattr(owner, name, self.wrap(getattr(owner, name), label))
+
+    def wrap(self, function, name):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            self.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit()
+        return timed
+
+    def restore(self):
+        for owner, name, original, own in reversed(self.patched):
+            if own:
+                setattr(owner, name, original)
+            else:
+                delattr(owner, name)
+        self.patched.clear()
+
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def enter(self, name):
+        if not self.stack and self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            tracemalloc.reset_peak()
+            self.traced = tracemalloc.get_traced_memory()[0]
+
+        path = self.stack[-1][0] + (name,) if self.stack else (name,)
+        self.stack.append([path, time.perf_counter_ns(), 0])
+
+    def exit(self):
+        path, start, _ = self.stack.pop()
+        elapsed = time.perf_counter_ns() - start
+        self.total[path] = self.total.get(path, 0) + elapsed
+        self.calls[path] = self.calls.get(path, 0) + 1
+        if self.stack:
+            parent = self.stack[-1][0]
+            self.children[parent] = self.children.get(parent, 0) + elapsed
+            return
+
+        self.steps += 1
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocations.append((current - self.traced, peak - self.traced))
+
+    def self_time(self, path):
+        return self.total[path] - self.children.get(path, 0)
+
+    def report(self):
+        return [{"stack": ";".join(path),
+                 "calls": self.calls[path],
+                 "total": self.total[path] / 1e9,
+                 "self": self.self_time(path) / 1e9}
+                for path in sorted(self.total)]
+
+    def to_json(self, path):
+        with open(path, "w") as file:
+            json.dump({"steps": self.steps,
+                       "phases": self.report(),
+                       "allocations": [{"allocated": allocated, "peak": peak}
+                                       for allocated, peak in self.allocations]},
+                      file, indent=2)
+
+    def to_collapsed(self, path):
+        with open(path, "w") as file:
+            for stack in sorted(self.total):
+                microseconds = self.self_time(stack) // 1000
+                if microseconds > 0:
+                    file.write("%s %d\n" % (";".join(stack), microseconds))
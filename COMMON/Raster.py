@@ -0,0 +1,71 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Rasterization of the grids of the models.
+
+    Builds the frame of a step (the grid reported to the recorders and the
+    stop conditions) from the positions of the agents as arrays, with one
+    fancy-indexing assignment over a background (a value or an array such
+    as the floor), instead of visiting every cell of the grid from Python.
+
+'''
+
+# Imports
+import numpy as np
+
+
+def positions(agents):
+    '''
+        (x, y) arrays of the positions of the Mesa agents.
+    '''
+    cells = np.array([agent.pos for agent in agents], dtype=np.int64)
+    cells = cells.reshape(-1, 2)
+    return cells[:, 0], cells[:, 1]
+
+
+def attribute(agents, name, dtype=None):
+    '''
+        Array of the attribute name of each agent.
+    '''
+    return np.array([getattr(agent, name) for agent in agents], dtype=dtype)
+
+
+'''
+    Rasterizer
+
+    Parameters:
+        - codes: Value drawn for each kind of agent (kind -> value), the
+          agents of other kinds are not drawn (None draws the values as
+          they are)
+
+'''
+
+
+class Rasterizer:
+    def __init__(self, codes=None):
+        self.codes = codes
+        if codes is not None:
+            self.kinds = np.array(sorted(codes))
+            self.values = np.array([codes[kind] for kind in self.kinds])
+
+    def draw(self, out, x, y, values=1, background=0):
+        '''
+            Fills out with background and draws the agents at (x, y) with
+            their values (kinds if there are codes), a number or one per
+            agent. The last agent of a cell is the one drawn.
+        '''
+        out[...] = background
+        if self.codes is None:
+            out[x, y] = values
+            return out
+
+        kinds = np.broadcast_to(np.asarray(values), np.shape(x))
+        if len(self.kinds) == 0:
+            return out
+        index = np.minimum(np.searchsorted(self.kinds, kinds),
+                           len(self.kinds) - 1)
+        known = self.kinds[index] == kinds
+        out[np.asarray(x)[known], np.asarray(y)[known]] = \
+            self.values[index[known]]
+        return out
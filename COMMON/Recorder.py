@@ -0,0 +1,130 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Delta-encoded frame recorder.
+
+    Stores a keyframe (full copy of the grid) every keyframe_interval steps,
+    and for the other steps only the cells that changed since the previous
+    step (flat index, new value). Any step can be rebuilt from the closest
+    keyframe before it, so the memory grows with the activity of the model
+    instead of with the area of the grid by the number of steps.
+
+'''
+
+# Imports
+from bisect import bisect_right
+import numpy as np
+
+'''
+    FrameRecorder
+
+    Parameters:
+        - keyframe_interval: Number of steps between two keyframes
+        - dtype: Type of the recorded values (type of the first frame if None)
+
+    Atributes:
+        - shape: Shape of the recorded frames
+        - key_steps: Steps stored as keyframes
+        - keyframes: Full frames of the key steps
+        - deltas: Changes of each step (None for key steps)
+
+'''
+
+
+class FrameRecorder:
+    def __init__(self, keyframe_interval=100, dtype=None):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+
+        self.keyframe_interval = keyframe_interval
+        self.dtype = dtype
+        self.shape = None
+        self.key_steps = []
+        self.keyframes = []
+        self.deltas = []
+        self.last = None
+        self.cache = None
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def record(self, frame):
+        frame = np.asarray(frame)
+        if self.shape is None:
+            self.shape = frame.shape
+            if self.dtype is None:
+                self.dtype = frame.dtype
+        elif frame.shape != self.shape:
+            raise ValueError("Frame of shape %s, expected %s" %
+                             (frame.shape, self.shape))
+
+        frame = frame.astype(self.dtype, copy=True).ravel()
+        step = len(self.deltas)
+
+        changed = None
+        if self.last is not None:
+            changed = np.flatnonzero(frame != self.last)
+
+        # Keyframe on the interval, or when the delta would not be smaller
+        if (changed is None or step % self.keyframe_interval == 0 or
+                len(changed) * 2 >= frame.size):
+            self.key_steps.append(step)
+            self.keyframes.append(frame)
+            self.deltas.append(None)
+        else:
+            index_type = np.int32 if frame.size < 2**31 else np.int64
+            self.deltas.append((changed.astype(index_type), frame[changed]))
+
+        self.last = frame
+
+    def __getitem__(self, step):
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError("Step %d out of range" % step)
+
+        position = bisect_right(self.key_steps, step) - 1
+        key = self.key_steps[position]
+
+        # Continue from the last rebuilt frame when it is on the way
+        if self.cache is not None and key <= self.cache[0] <= step:
+            current, frame = self.cache
+        else:
+            current = key
+            frame = self.keyframes[position].copy()
+
+        for delta in self.deltas[current + 1:step + 1]:
+            frame[delta[0]] = delta[1]
+
+        self.cache = (step, frame)
+        return frame.reshape(self.shape).copy()
+
+    def __iter__(self):
+        for step in range(len(self)):
+            yield self[step]
+
+    @property
+    def nbytes(self):
+        total = sum(keyframe.nbytes for keyframe in self.keyframes)
+        for delta in self.deltas:
+            if delta is not None:
+                total += delta[0].nbytes + delta[1].nbytes
+        return total
+
+
+'''
+    NullRecorder
+
+    Recorder that keeps nothing, for the runs without replay (experiments,
+    benchmarks).
+
+'''
+
+
+class NullRecorder:
+    def __len__(self):
+        return 0
+
+    def record(self, frame):
+        pass
@@ -0,0 +1,178 @@
+'''
+
+    TC2008B - Multi-Agent Models
+
+    Stop conditions of the simulations.
+
+    A condition is checked after each step of a model and returns the
+    reason to stop (a string) or None. The models keep a StopConditions
+    object, stop running when one of its conditions is met and keep the
+    reason in model.stop_reason.
+
+    The measures are functions model -> value (number or sequence), like
+    the reporters of a DataCollector.
+
+'''
+
+# Imports
+from collections import deque
+import time
+import numpy as np
+
+'''
+    StopConditions
+
+    Parameters:
+        - conditions: Conditions checked in order after each step
+
+    Atributes:
+        - reason: Reason of the first condition met (None while running)
+
+'''
+
+
+class StopConditions:
+    def __init__(self, *conditions):
+        self.conditions = list(conditions)
+        self.reason = None
+
+    def check(self, model):
+        for condition in self.conditions:
+            reason = condition.check(model)
+            if reason is not None:
+                self.reason = reason
+                return reason
+        return None
+
+
+'''
+    Extinction: Stops when any of the values of the measure is zero.
+
+    Parameters:
+        - measure: Function model -> counts (e.g. (nonines, deddians))
+        - names: Name of each count
+'''
+
+
+class Extinction:
+    def __init__(self, measure, names=None):
+        self.measure = measure
+        self.names = names
+
+    def check(self, model):
+        counts = np.atleast_1d(self.measure(model))
+        for index, count in enumerate(counts):
+            if count == 0:
+                name = self.names[index] if self.names else str(index)
+                return "extinction of %s" % name
+        return None
+
+
+'''
+    Predicate: Stops when a function model -> bool is True.
+
+    Parameters:
+        - predicate: Function model -> bool
+        - reason: Reason reported when the predicate is True
+'''
+
+
+class Predicate:
+    def __init__(self, predicate, reason):
+        self.predicate = predicate
+        self.reason = reason
+
+    def check(self, model):
+        return self.reason if self.predicate(model) else None
+
+
+'''
+    SteadyState: Stops when the measure does not change (more than the
+    tolerance, relative to its mean) along a window of steps.
+
+    Parameters:
+        - measure: Function model -> value
+        - window: Number of steps of the window
+        - tolerance: Maximum variation, relative to the mean of the window
+'''
+
+
+class SteadyState:
+    def __init__(self, measure, window=50, tolerance=0.05):
+        self.measure = measure
+        self.window = deque(maxlen=window)
+        self.tolerance = tolerance
+
+    def check(self, model):
+        self.window.append(np.atleast_1d(self.measure(model)).astype(float))
+        if len(self.window) < self.window.maxlen:
+            return None
+
+        values = np.array(self.window)
+        scale = np.maximum(np.abs(values.mean(axis=0)), 1)
+        if np.all(np.ptp(values, axis=0) <= self.tolerance * scale):
+            return "steady state"
+        return None
+
+
+'''
+    Cycle: Stops when the measure repeats itself with a period along a
+    window of steps (the window must hold at least two periods).
+
+    Parameters:
+        - measure: Function model -> value
+        - window: Number of steps of the window
+        - tolerance: Maximum difference, relative to the amplitude
+        - min_period: Minimum period of the cycle
+        - interval: Number of steps between two checks
+'''
+
+
+class Cycle:
+    def __init__(self, measure, window=200, tolerance=0.1, min_period=2,
+                 interval=10):
+        self.measure = measure
+        self.window = deque(maxlen=window)
+        self.tolerance = tolerance
+        self.min_period = min_period
+        self.interval = interval
+        self.steps = 0
+
+    def check(self, model):
+        self.window.append(np.atleast_1d(self.measure(model)).astype(float))
+        self.steps += 1
+        if len(self.window) < self.window.maxlen or self.steps % self.interval:
+            return None
+
+        values = np.array(self.window)
+        amplitude = np.ptp(values, axis=0)
+        if np.all(amplitude == 0):
+            return None
+
+        limit = self.tolerance * amplitude
+        for period in range(self.min_period, len(values) // 2 + 1):
+            if np.all(np.abs(values[period:] - values[:-period]) <= limit):
+                return "cycle of period %d" % period
+        return None
+
+
+'''
+    WallClock: Stops when the time since the first check exceeds a budget.
+
+    Parameters:
+        - seconds: Budget of time of the simulation
+'''
+
+
+class WallClock:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.start = None
+
+    def check(self, model):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        if now - self.start >= self.seconds:
+            return "wall clock (%s seconds)" % self.seconds
+        return None
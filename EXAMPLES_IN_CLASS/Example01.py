@@ -3,6 +3,13 @@
 # Date: 03/11/2022
 
 from mesa.datacollection import DataCollector
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from COMMON.Recorder import FrameRecorder
+from COMMON.Placement import sample_cells
+from COMMON.Raster import Rasterizer, positions
+from COMMON.StopConditions import StopConditions, Predicate, WallClock
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
 from mesa import Agent, Model
@@ -12,7 +19,6 @@ import matplotlib.pyplot as plt
 import matplotlib
 import pandas as pd
 import numpy as np
-print("Example01.py is running...")
 
 # Import libraries for management of data
 
@@ -44,26 +50,26 @@ class RobotVaccumCleanerAgent(Agent):
         if self.model.floor[self.pos[0]][self.pos[1]] == 1:
             self.model.floor[self.pos[0]][self.pos[1]] = 0
         else:
-            i = int(np.random.rand() * LIMIT) % len(options)
+            i = int(self.model.rng.random() * LIMIT) % len(options)
             ren = self.pos[0] + options[i][0]
             col = self.pos[1] + options[i][1]
             if self.can_move(ren, col):
                 self.model.grid.move_agent(self, (ren, col))
 
 
+# Frame of the model: 2 dirty cell, 1 robot, 0 clean cell
+RASTERIZER = Rasterizer()
+
+
 def get_grid(model):
-    grid = np.zeros((model.grid.height, model.grid.width))
-    for i in range(model.grid.height):
-        for j in range(model.grid.width):
-            if model.grid.is_cell_empty((i, j)):
-                grid[i][j] *= 2
-            else:
-                grid[i][j] = 1
-    return grid
+    grid = np.zeros(model.floor.shape)
+    x, y = positions(model.schedule.agents)
+    return RASTERIZER.draw(grid, x, y, 1, model.floor * 2)
 
 
 class RobotVacuumCleanerModel(Model):
-    def __init__(self, height, width, num_robots=1, dirty_cell_percentage=0.5):
+    def __init__(self, height, width, num_robots=1, dirty_cell_percentage=0.5, seed=None,
+                 stop_conditions=None):
         self.num_robots = num_robots
         self.dirty_cell_percentage = dirty_cell_percentage
         self.height = height
@@ -71,55 +77,65 @@ class RobotVacuumCleanerModel(Model):
         self.grid = MultiGrid(height, width, False)
         self.floor = np.zeros((height, width))
         self.schedule = RandomActivation(self)
+        self.rng = np.random.default_rng(self.random.getrandbits(64))
+        self.stop_conditions = stop_conditions
+        self.running = True
+        self.stop_reason = None
 
         amount = int(height * width * dirty_cell_percentage)
-        for i in range(amount):
-            finished = False
-            while not finished:
-                ren = int(np.random.rand() * LIMIT) % height
-                col = int(np.random.rand() * LIMIT) % width
-                if self.floor[ren][col] == 0:
-                    self.floor[ren][col] = 1
-                    finished = True
+        ren, col = sample_cells(self.rng, self.floor == 0, amount)
+        self.floor[ren, col] = 1
 
         for i in range(self.num_robots):
             a = RobotVaccumCleanerAgent(i, self)
             self.grid.place_agent(a, (0, 0))
             self.schedule.add(a)
-        self.datacollector = DataCollector(
-            model_reporters={"Grid": get_grid})
+        self.datacollector = DataCollector()
+        self.recorder = FrameRecorder()
 
     def step(self):
         self.datacollector.collect(self)
+        self.recorder.record(get_grid(self))
         self.schedule.step()
 
+        if self.stop_conditions is not None:
+            self.stop_reason = self.stop_conditions.check(self)
+            self.running = self.stop_reason is None
+
     def is_all_clean(self):
         return np.all(self.floor == 0)
 
 
-GRID_SIZE = 10
-MAX_ITERATIONS = 200
-start_time = time.time()
-model = RobotVacuumCleanerModel(GRID_SIZE, GRID_SIZE)
-i = 1
-while not model.is_all_clean() and i <= MAX_ITERATIONS:
-    model.step()
-    i += 1
+if __name__ == "__main__":
+    print("Example01.py is running...")
+    GRID_SIZE = 10
+    MAX_ITERATIONS = 200
+    TIME_BUDGET = 60
+    start_time = time.time()
+    model = RobotVacuumCleanerModel(GRID_SIZE, GRID_SIZE, stop_conditions=StopConditions(
+        Predicate(RobotVacuumCleanerModel.is_all_clean, "clean floor"),
+        WallClock(TIME_BUDGET)))
+    i = 1
+    while model.running and i <= MAX_ITERATIONS:
+        model.step()
+        i += 1
+
+    print("Stopped by: ", model.stop_reason or "max iterations")
+
+    print("Time of execution: ", time.time() - start_time)
 
-print("Time of execution: ", time.time() - start_time)
 
+    all_grids = model.recorder
+    fig, axs = plt.subplots(figsize=(7, 7))
+    axs.set_xticks([])
+    axs.set_yticks([])
+    patch = plt.imshow(all_grids[0], cmap="gray")
 
-all_grids = model.datacollector.get_model_vars_dataframe()
-fig, axs = plt.subplots(figsize=(7, 7))
-axs.set_xticks([])
-axs.set_yticks([])
-patch = plt.imshow(all_grids.iloc[0][0], cmap="gray")
+    def animate(i):
+        patch.set_data(all_grids[i])
 
-def animate(i):
-    patch.set_data(all_grids.iloc[i][0])
-    
-anim = animation.FuncAnimation(fig, animate, frames=len(all_grids), interval=100)
-anim.save('Example01.gif', writer='imagemagick', fps=10)
+    anim = animation.FuncAnimation(fig, animate, frames=len(all_grids), interval=100)
+    anim.save('Example01.gif', writer='imagemagick', fps=10)
 
 
-print("Example01.py is finished...")
+    print("Example01.py is finished...")
@@ -11,6 +11,10 @@ from mesa.space import MultiGrid
 from mesa.datacollection import DataCollector
 # Lotes de trabajo, cuando mando pequeños fragmentos de cosas muy complejas
 from mesa.batchrunner import BatchRunner
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from COMMON.StopConditions import StopConditions, SteadyState, WallClock
 
 class MoneyAgent(Agent):
     def __init__(self, unique_id, model):
@@ -23,9 +27,22 @@ class MoneyAgent(Agent):
             other_agent.wealth += 1
             self.wealth -= 1
 
+# Gini coefficient of the wealth of the agents (0 equal, 1 one agent has all)
+def compute_gini(model):
+    wealths = np.sort([agent.wealth for agent in model.schedule.agents])
+    n = len(wealths)
+    if n == 0 or wealths.sum() == 0:
+        return 0.0
+    return float(((2 * np.arange(1, n + 1) - n - 1) * wealths).sum() /
+                 (n * wealths.sum()))
+
+
 class MoneyModel(Model):
-    def __init__(self, num_agents):
+    def __init__(self, num_agents, seed=None, stop_conditions=None):
         self.num_agents = num_agents
+        self.stop_conditions = stop_conditions
+        self.running = True
+        self.stop_reason = None
         self.schedule = RandomActivation(self)
 
         for i in range(self.num_agents):
@@ -35,23 +52,43 @@ class MoneyModel(Model):
     def step(self):
         self.schedule.step()
 
-model = MoneyModel(10)
-for i in range(10):
-    model.step()
+        if self.stop_conditions is not None:
+            self.stop_reason = self.stop_conditions.check(self)
+            self.running = self.stop_reason is None
 
-agents_wealth = [agent.wealth for agent in model.schedule.agents]
-plt.hist(agents_wealth)
+if __name__ == "__main__":
+    NUM_AGENTS = 10
+    MAX_ITERATIONS = 10
+    RUNS = 100
+    TIME_BUDGET = 60
 
-all_wealth = []
-for i in range(100):
+    # The conditions keep state (window, start time): new ones for each model
+    def stop_conditions():
+        return StopConditions(SteadyState(compute_gini, window=5, tolerance=0),
+                              WallClock(TIME_BUDGET))
 
-    model = MoneyModel(10)
-    for j in range(10):
+    model = MoneyModel(NUM_AGENTS, stop_conditions=stop_conditions())
+    for i in range(MAX_ITERATIONS):
         model.step()
-    for agent in model.schedule.agents:
-        all_wealth.append(agent.wealth)
+        if not model.running:
+            break
+    print("Stopped by: ", model.stop_reason or "max iterations")
+
+    agents_wealth = [agent.wealth for agent in model.schedule.agents]
+    plt.hist(agents_wealth)
+
+    all_wealth = []
+    for i in range(RUNS):
+
+        model = MoneyModel(NUM_AGENTS, stop_conditions=stop_conditions())
+        for j in range(MAX_ITERATIONS):
+            model.step()
+            if not model.running:
+                break
+        for agent in model.schedule.agents:
+            all_wealth.append(agent.wealth)
 
-plt.hist(all_wealth, bins=range(max(all_wealth)+1))
+    plt.hist(all_wealth, bins=range(max(all_wealth)+1))
 
 
 
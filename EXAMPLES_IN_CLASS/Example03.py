@@ -6,6 +6,13 @@ from mesa import Agent, Model
 from mesa.space import SingleGrid
 from mesa.time import SimultaneousActivation
 from mesa.datacollection import DataCollector
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from COMMON.Recorder import FrameRecorder
+from COMMON.Raster import Rasterizer, positions, attribute
+from COMMON.Neighbourhood import neighbourhood_table
+from COMMON.StopConditions import StopConditions, SteadyState, Cycle
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -13,20 +20,19 @@ import matplotlib.animation as animation
 plt.rcParams['animation.html'] = 'jshtml'
 matplotlib.rcParams['animation.embed_limit'] = 2**128
 
-print("Starting execute: 'Ejemplo 03: Modelo de juego de la vida'")
 
 
 class GameLifeAgent(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
-        self.alive = np.random.choice([0, 1])
+        self.alive = self.random.choice([0, 1])
         self.next_state = None
 
     def step(self):
         live_neighbours = 0
 
-        for neighbour in self.model.grid.neighbor_iter(self.pos):
-            live_neighbours += neighbour.alive
+        for (x, y) in self.model.neighbourhood.neighbours(self.pos):
+            live_neighbours += self.model.grid.grid[x][y].alive
 
         self.next_state = self.alive
         if self.next_state == 1:
@@ -40,20 +46,28 @@ class GameLifeAgent(Agent):
         self.alive = self.next_state
 
 
+# Frame of the model: the state of each cell (1 alive, 0 dead)
+RASTERIZER = Rasterizer()
+
+
 def get_grid(model):
     grid = np.zeros((model.grid.width, model.grid.height))
-    for (content, x, y) in model.grid.coord_iter():
-        grid[x][y] = content.alive
-    return grid
+    x, y = positions(model.schedule.agents)
+    return RASTERIZER.draw(grid, x, y, attribute(model.schedule.agents, "alive"))
 
 
 class GameLifeModel(Model):
-    def __init__(self, width, height, ):
+    def __init__(self, width, height, seed=None, stop_conditions=None):
+        self.stop_conditions = stop_conditions
+        self.running = True
+        self.stop_reason = None
         self.num_agents = width * height
         self.grid = SingleGrid(width, height, torus=True)
+        # Moore neighbours of each cell, looked up by the agents
+        self.neighbourhood = neighbourhood_table(width, height, moore=True, torus=True)
         self.schedule = SimultaneousActivation(self)
-        self.datacollector = DataCollector(
-            model_reporters={"Grid": get_grid})
+        self.datacollector = DataCollector()
+        self.recorder = FrameRecorder()
 
         for (content, x, y) in self.grid.coord_iter():
             a = GameLifeAgent((x, y), self)
@@ -62,33 +76,45 @@ class GameLifeModel(Model):
 
     def step(self):
         self.datacollector.collect(self)
+        self.recorder.record(get_grid(self))
         self.schedule.step()
 
+        if self.stop_conditions is not None:
+            self.stop_reason = self.stop_conditions.check(self)
+            self.running = self.stop_reason is None
+
 
-GRID_SIZE = 100
-MAX_GENERATIONS = 100
+if __name__ == "__main__":
+    print("Starting execute: 'Ejemplo 03: Modelo de juego de la vida'")
+    GRID_SIZE = 100
+    MAX_GENERATIONS = 100
 
-start_time = time.time()
-model = GameLifeModel(GRID_SIZE, GRID_SIZE)
-for i in range(MAX_GENERATIONS):
-    model.step()
-print("Execution time: %s seconds" % str((time.time() - start_time)))
+    start_time = time.time()
+    model = GameLifeModel(GRID_SIZE, GRID_SIZE, stop_conditions=StopConditions(
+        SteadyState(get_grid, window=2, tolerance=0),
+        Cycle(get_grid, window=30, tolerance=0, interval=1)))
+    for i in range(MAX_GENERATIONS):
+        model.step()
+        if not model.running:
+            break
+    print("Stopped by: ", model.stop_reason or "max generations")
+    print("Execution time: %s seconds" % str((time.time() - start_time)))
 
 
-all_grid = model.datacollector.get_model_vars_dataframe()
+    all_grid = model.recorder
 
-fig, axis = plt.subplots(figsize=(10, 10))
-axis.set_xticks([])
-axis.set_yticks([])
-patch = axis.imshow(all_grid.iloc[0][0], cmap=plt.cm.binary)
+    fig, axis = plt.subplots(figsize=(10, 10))
+    axis.set_xticks([])
+    axis.set_yticks([])
+    patch = axis.imshow(all_grid[0], cmap=plt.cm.binary)
 
 
-def animate(i):
-    patch.set_data(all_grid.iloc[i][0])
+    def animate(i):
+        patch.set_data(all_grid[i])
 
 
-anim = animation.FuncAnimation(
-    fig, animate, frames=MAX_GENERATIONS, interval=100)
-anim.save('Ejemplo03.gif', writer='imagemagick', fps=10)
+    anim = animation.FuncAnimation(
+        fig, animate, frames=len(all_grid), interval=100)
+    anim.save('Ejemplo03.gif', writer='imagemagick', fps=10)
 
-print("Finished execute: 'Ejemplo 03: Modelo de juego de la vida'")
+    print("Finished execute: 'Ejemplo 03: Modelo de juego de la vida'")
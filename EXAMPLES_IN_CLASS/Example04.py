@@ -7,6 +7,10 @@ from mesa import Agent, Model
 from mesa.time import RandomActivation
 
 from mesa.datacollection import DataCollector
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from COMMON.StopConditions import StopConditions, WallClock
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -20,10 +24,10 @@ class FlockAgent(Agent):
         super().__init__(unique_id, model)
         self.position = np.array((x, y), dtype=np.float64)
 
-        vec = (np.random.rand(2) - 0.5) * 10
+        vec = (model.rng.random(2) - 0.5) * 10
         self.velocity = np.array(vec, dtype=np.float64)
 
-        vec = (np.random.rand(2) - 0.5) / 2
+        vec = (model.rng.random(2) - 0.5) / 2
         self.acceleration = np.array(vec, dtype=np.float64)
 
         # Aceleration that must have for can integrate
@@ -152,15 +156,19 @@ def get_particles(model):
 
 
 class FlockModel(Model):
-    def __init__(self, width, height, num_agents):
+    def __init__(self, width, height, num_agents, seed=None, stop_conditions=None):
         self.num_agents = num_agents
+        self.stop_conditions = stop_conditions
+        self.running = True
+        self.stop_reason = None
+        self.rng = np.random.default_rng(self.random.getrandbits(64))
         self.schedule = RandomActivation(self)
         self.datacollector = DataCollector(
             model_reporters={"Particles": get_particles})
 
         for i in range(self.num_agents):
-            x = np.random.rand() * width
-            y = np.random.rand() * height
+            x = self.rng.random() * width
+            y = self.rng.random() * height
             a = FlockAgent(i, self, x, y, width, height)
             self.schedule.add(a)
 
@@ -168,35 +176,45 @@ class FlockModel(Model):
         self.datacollector.collect(self)
         self.schedule.step()
 
+        if self.stop_conditions is not None:
+            self.stop_reason = self.stop_conditions.check(self)
+            self.running = self.stop_reason is None
 
-WIDTH = 1000
-HEIGHT = 1000
-NUM_AGENTS = 20  # 200
-MAX_ITER = 50  # 500
 
-start_time = time.time()
+if __name__ == "__main__":
+    WIDTH = 1000
+    HEIGHT = 1000
+    NUM_AGENTS = 20  # 200
+    MAX_ITER = 50  # 500
+    TIME_BUDGET = 60
 
-model = FlockModel(NUM_AGENTS, WIDTH, HEIGHT)
-for i in range(MAX_ITER):
-    model.step()
+    start_time = time.time()
 
-print("Tiempo de ejecución: ", str(
-    datetime.timedelta(seconds=(time.time() - start_time))))
+    model = FlockModel(NUM_AGENTS, WIDTH, HEIGHT,
+                       stop_conditions=StopConditions(WallClock(TIME_BUDGET)))
+    for i in range(MAX_ITER):
+        model.step()
+        if not model.running:
+            break
+    print("Stopped by: ", model.stop_reason or "max iterations")
 
-all_positions = model.datacollector.get_model_vars_dataframe()
-fig, ax = plt.subplots(figsize=(10, 10))
+    print("Tiempo de ejecución: ", str(
+        datetime.timedelta(seconds=(time.time() - start_time))))
 
-scatter = ax.scatter(
-    all_positions.iloc[0][0][:, 0], all_positions.iloc[0][0][:, 1], s=20, edgecolors='k')
+    all_positions = model.datacollector.get_model_vars_dataframe()
+    fig, ax = plt.subplots(figsize=(10, 10))
 
-ax.axis([0, WIDTH, 0, HEIGHT])
+    scatter = ax.scatter(
+        all_positions.iloc[0][0][:, 0], all_positions.iloc[0][0][:, 1], s=20, edgecolors='k')
 
+    ax.axis([0, WIDTH, 0, HEIGHT])
 
-def animate(i):
-    scatter.set_offsets(all_positions.iloc[i][0])
-    return scatter
 
+    def animate(i):
+        scatter.set_offsets(all_positions.iloc[i][0])
+        return scatter
 
-anim = animation.FuncAnimation(fig, animate, frames=MAX_ITER, interval=100)
 
-anim.save('example04.gif', writer='imagemagick', fps=30)
+    anim = animation.FuncAnimation(fig, animate, frames=len(all_positions), interval=100)
+
+    anim.save('example04.gif', writer='imagemagick', fps=30)
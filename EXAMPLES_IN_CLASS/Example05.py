@@ -9,6 +9,14 @@ from mesa.space import SingleGrid
 from mesa.time import RandomActivation
 
 from mesa.datacollection import DataCollector
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from COMMON.Recorder import FrameRecorder
+from COMMON.StopConditions import StopConditions, SteadyState
+from COMMON.ColorClasses import color_classes
+from COMMON.Raster import Rasterizer, positions, attribute
+from COMMON.Neighbourhood import neighbourhood_table
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -24,12 +32,13 @@ class SegregationAgent(Agent):
         self.threshold = threshold
 
     def step(self):
-        neighbors = self.model.grid.get_neighbors(
-            self.pos, moore=True, include_center=False)
         same_type = 0
         total_neighbors = 0
         fraction = 0
-        for neighbour in neighbors:
+        for (x, y) in self.model.neighbourhood.neighbours(self.pos):
+            neighbour = self.model.grid.grid[x][y]
+            if neighbour is None:
+                continue
             if self.type == neighbour.type:
                 same_type += 1
             total_neighbors += 1
@@ -40,65 +49,145 @@ class SegregationAgent(Agent):
             self.model.grid.move_to_empty(self)
 
 
+# Frame of the model: the type of the agent of each cell (0 empty)
+RASTERIZER = Rasterizer()
+
+
 def get_grid(model):
     grid = np.zeros((model.grid.width, model.grid.height))
-    for (content, x, y) in model.grid.coord_iter():
-        if (content == None):
-            grid[x][y] = 0
-        else:
-            grid[x][y] = content.type
-    return grid
+    x, y = positions(model.schedule.agents)
+    return RASTERIZER.draw(grid, x, y, attribute(model.schedule.agents, "type"))
 
 
 class SegregationModel(Model):
-    def __init__(self, width, heigth, diff_types=2, threshlod=0.30, empty_cells=0.20):
+    def __init__(self, width, heigth, diff_types=2, threshlod=0.30, empty_cells=0.20, seed=None,
+                 stop_conditions=None, scheduler="random"):
+        # scheduler: "random" (RandomActivation, one agent at a time) or
+        # "color" (batches by color classes, see step_colors)
+        if scheduler not in ("random", "color"):
+            raise ValueError("Unknown scheduler: %s" % scheduler)
+
+        self.scheduler = scheduler
+        self.colors, self.classes = color_classes(width, heigth, moore=True)
+        self.stop_conditions = stop_conditions
+        self.running = True
+        self.stop_reason = None
         self.num_agents = width * heigth * (1-empty_cells)
         self.grid = SingleGrid(width, heigth, False)
+        # Moore neighbours of each cell (moore=True, include_center=False)
+        self.neighbourhood = neighbourhood_table(width, heigth, moore=True)
         self.schedule = RandomActivation(self)
-        self.datacollector = DataCollector(model_reporters={"Grid": get_grid})
+        self.datacollector = DataCollector()
+        self.recorder = FrameRecorder()
 
         id = 0
         amount = int(self.num_agents / diff_types)
+        # Distinct random cells of all the agents, drawn from the empty cells
+        # sorted once (the order of the set changes between runs)
+        cells = iter(self.random.sample(sorted(self.grid.empties),
+                                        amount * diff_types))
         for my_type in range(1, diff_types+1):
             for j in range(amount):
                 a = SegregationAgent(id, self, my_type, threshlod)
-                (x, y) = self.grid.find_empty()
+                (x, y) = next(cells)
                 self.grid.place_agent(a, (x, y))
                 self.schedule.add(a)
                 id += 1
 
     def step(self):
         self.datacollector.collect(self)
-        self.schedule.step()
-
-
-WIDTH = 30
-HEIGHT = 30
-THRESHOLD = 0.60
-TYPES = 2
-EMPTY_CELLS = 0.20
-MAX_ITERATIONS = 100
-
-start_time = time.time()
-model = SegregationModel(WIDTH, HEIGHT, TYPES, THRESHOLD, EMPTY_CELLS)
-
-for i in range(MAX_ITERATIONS):
-    model.step()
-
-print("Execution time: %s seconds" %
-      str(datetime.timedelta(seconds=(time.time() - start_time))))
-
-
-all_grid = model.datacollector.get_model_vars_dataframe()
-fig, axs = plt.subplots(figsize=(10, 10))
-axs.set_xticks([])
-axs.set_yticks([])
-patch = plt.imshow(all_grid.iloc[0][0], cmap=plt.cm.binary)
-
-
-def animate(i):
-    patch.set_data(all_grid.iloc[i][0])
-
-
-anim = animation.FuncAnimation(fig, animate, frames=MAX_ITERATIONS)
-anim.save('Example05.gif', writer='imagemagick', fps=10)
+        grid = get_grid(self)
+        self.recorder.record(grid)
+        if self.scheduler == "color":
+            self.step_colors(grid)
+        else:
+            self.schedule.step()
+
+        if self.stop_conditions is not None:
+            self.stop_reason = self.stop_conditions.check(self)
+            self.running = self.stop_reason is None
+
+    # Steps the agents by color classes (COMMON/ColorClasses.py): the classes
+    # are visited in a random order and the agents of a class (no two of them
+    # are neighbours) decide at the same time with the grid before the batch,
+    # the unhappy ones move to distinct random empty cells. An agent acts once
+    # per step. Differences with RandomActivation: the agents of a batch do not
+    # see the agents that arrive next to them in the same batch, and the empty
+    # cells of the batch do not include the cells left by the batch. When the
+    # batch has more unhappy agents than empty cells, the ones that move are a
+    # random subset of them (as the first ones of the random order would be).
+    # The types, thresholds and acted flags are lattices moved with the
+    # agents, only the moves of the Mesa grid are done agent by agent.
+    # types is the frame of the step (get_grid), updated in place.
+    def step_colors(self, types):
+        width, height = types.shape
+        x, y = positions(self.schedule.agents)
+        thresholds = RASTERIZER.draw(np.zeros(types.shape), x, y,
+                                     attribute(self.schedule.agents, "threshold"))
+        acted = np.zeros(types.shape, dtype=bool)
+        order = list(range(self.classes))
+        self.random.shuffle(order)
+
+        for color in order:
+            xs, ys = np.nonzero((self.colors == color) & (types != 0) & ~acted)
+            nx, ny, valid = self.neighbourhood.lookup(xs, ys)
+            neighbours = np.where(valid, types[nx, ny], 0)
+            same = (neighbours == types[xs, ys, None]).sum(axis=1)
+            total = (neighbours != 0).sum(axis=1)
+            fraction = np.divide(same, total, out=np.zeros(len(xs)),
+                                 where=total != 0)
+            unhappy = fraction < thresholds[xs, ys]
+            xs, ys = xs[unhappy], ys[unhappy]
+            # Unhappy agents in a random order, so the cut below is random
+            shuffle = np.array(self.random.sample(range(len(xs)), len(xs)),
+                               dtype=np.int64)
+            xs, ys = xs[shuffle], ys[shuffle]
+
+            empties = np.flatnonzero(types.ravel() == 0)
+            cells = self.random.sample(list(empties), min(len(xs), len(empties)))
+            xs, ys = xs[:len(cells)], ys[:len(cells)]
+            tx, ty = np.divmod(np.array(cells, dtype=np.int64), height)
+            movers = [self.grid.grid[i][j] for i, j in zip(xs.tolist(), ys.tolist())]
+            types[tx, ty] = types[xs, ys]
+            thresholds[tx, ty] = thresholds[xs, ys]
+            types[xs, ys] = 0
+            acted[tx, ty] = True
+            for agent, i, j in zip(movers, tx.tolist(), ty.tolist()):
+                self.grid.move_agent(agent, (i, j))
+
+if __name__ == "__main__":
+    WIDTH = 30
+    HEIGHT = 30
+    THRESHOLD = 0.60
+    TYPES = 2
+    EMPTY_CELLS = 0.20
+    MAX_ITERATIONS = 100
+
+    start_time = time.time()
+    model = SegregationModel(WIDTH, HEIGHT, TYPES, THRESHOLD, EMPTY_CELLS,
+                             stop_conditions=StopConditions(
+                                 SteadyState(get_grid, window=2, tolerance=0)))
+
+    for i in range(MAX_ITERATIONS):
+        model.step()
+        if not model.running:
+            break
+    print("Stopped by: ", model.stop_reason or "max iterations")
+
+    print("Execution time: %s seconds" %
+          str(datetime.timedelta(seconds=(time.time() - start_time))))
+
+
+    all_grid = model.recorder
+    fig, axs = plt.subplots(figsize=(10, 10))
+    axs.set_xticks([])
+    axs.set_yticks([])
+    patch = plt.imshow(all_grid[0], cmap=plt.cm.binary)
+
+
+    def animate(i):
+        patch.set_data(all_grid[i])
+
+
+    anim = animation.FuncAnimation(fig, animate, frames=len(all_grid))
+    anim.save('Example05.gif', writer='imagemagick', fps=10)
@@ -15,6 +15,14 @@
 from mesa import Agent
 import numpy as np
 
+# Codes of the agent types (lattice of the model and array engine)
+EMPTY = 0
+NONINE = 1
+DEDDIAN = 2
+
+# Von Neumann neighbourhood, in the same order as grid.iter_neighborhood
+NEIGHBORHOOD = ((-1, 0), (0, -1), (0, 1), (1, 0))
+
 '''
     Agent Prey - Nonine
 
@@ -38,19 +46,21 @@ import numpy as np
         - age: Age of the agent
         - type: Type of the agent
         - alive: Alive state of the agent
+
+    NonineBase has the behaviour of the agent, Nonine is the Mesa agent and
+    CompactNonine the slotted variant (without __dict__).
         
 '''
 
 
-class Nonine(Agent):
+class NonineBase:
+    __slots__ = ()
+
     def __init__(self, unique_id, model, x, y, active=True, initial_energy=10,
                  max_capacity=45, energy_rate=3, minimun_age=10, rate_of_reproduction=40,
                  maximum_age=25, energy_value=30, probability_reproduce=0.5):
         super().__init__(unique_id, model)
         self.model = model
-        self.x = x
-        self.y = y
-        self.initial_energy = initial_energy
         self.max_capacity = max_capacity
         self.energy_rate = energy_rate
         self.minimun_age = minimun_age
@@ -59,16 +69,25 @@ class Nonine(Agent):
         self.energy_value = energy_value
         self.probability_reproduce = probability_reproduce
         self.type = "Nonine"
+        self.code = NONINE
+        self.reset(unique_id, x, y, active, initial_energy)
+
+    def reset(self, unique_id, x, y, active, initial_energy):
+        self.unique_id = unique_id
+        self.pos = None
+        self.x = x
+        self.y = y
+        self.initial_energy = initial_energy
         self.energy = self.initial_energy
         self.age = 0
         self.alive = 1
         self.active = active
 
     def is_alive(self):
-        if self.age >= self.maximum_age:
-            self.alive = 0
-        if self.energy <= 0:
+        if self.alive == 1 and (self.age >= self.maximum_age or self.energy <= 0):
             self.alive = 0
+            self.model.deaths.append((self, self.unique_id))
+            self.model.step_deaths += 1
         return self.alive == 1
 
     def move(self):
@@ -78,7 +97,7 @@ class Nonine(Agent):
         if new_position is None:
             return
 
-        self.model.grid.move_agent(self, (new_position[0], new_position[1]))
+        self.model.move_agent(self, (new_position[0], new_position[1]))
         self.x = new_position[0]
         self.y = new_position[1]
 
@@ -86,16 +105,16 @@ class Nonine(Agent):
         if self.energy >= self.max_capacity:
             return
 
-        new_energy = self.model.floor[self.x][self.y]
+        new_energy = self.model.floor.read(self.x, self.y)
 
         if new_energy + self.energy >= self.max_capacity:
-            self.model.floor[self.x][self.y] = new_energy + \
-                self.energy - self.max_capacity
-            self.energy = self.max_capacity
+            self.model.floor.write(self.x, self.y, new_energy +
+                                   self.energy - self.max_capacity)
+            change_energy(self, self.max_capacity - self.energy)
             return
 
-        self.energy += new_energy
-        self.model.floor[self.x][self.y] = 0
+        self.model.floor.write(self.x, self.y, 0)
+        change_energy(self, new_energy)
 
     def reproduce(self):
         if not self.can_reproduce():
@@ -108,13 +127,9 @@ class Nonine(Agent):
 
         new_energy = self.energy // 2
 
-        new_agent = Nonine(self.model.next_id(), self.model,
-                           new_position[0], new_position[1],
-                           active=False, initial_energy=new_energy)
-        self.model.grid.place_agent(
-            new_agent, (new_position[0], new_position[1]))
-        self.model.schedule.add(new_agent)
-        self.energy = new_energy
+        self.model.new_agent(NONINE, new_position[0], new_position[1],
+                             active=False, initial_energy=new_energy)
+        change_energy(self, new_energy - self.energy)
 
     def can_reproduce(self):
         if self.age <= self.minimun_age:
@@ -126,12 +141,7 @@ class Nonine(Agent):
         if self.random.random() > self.probability_reproduce:
             return False
 
-        for content in self.model.grid.get_neighbors(self.pos, moore=False, include_center=False):
-            if content is not None:
-                if content.type == "Deddian":
-                    return False
-
-        return True
+        return len(neighborhood_cells(self, (DEDDIAN,))) == 0
 
     def step(self):
         if self.is_alive() and self.active:
@@ -139,7 +149,7 @@ class Nonine(Agent):
             self.eat()
             self.reproduce()
             self.age += 1
-            self.energy -= self.energy_rate
+            change_energy(self, -self.energy_rate)
 
 
 '''
@@ -164,35 +174,46 @@ class Nonine(Agent):
         - age: Age of the agent
         - type: Type of the agent
         - alive: Alive state of the agent
+
+    DeddianBase has the behaviour of the agent, Deddian is the Mesa agent and
+    CompactDeddian the slotted variant (without __dict__).
 '''
 
 
-class Deddian(Agent):
+class DeddianBase:
+    __slots__ = ()
+
     def __init__(self, unique_id, model, x, y, active=True, initial_energy=150,
                  max_capacity=200, energy_rate=3, probability_reproduce=0.5, minimun_age=10,
                  minimum_energy=120, maximum_age=50):
         super().__init__(unique_id, model)
         self.model = model
-        self.x = x
-        self.y = y
         self.max_capacity = max_capacity
         self.energy_rate = energy_rate
         self.probability_reproduce = probability_reproduce
         self.minimun_age = minimun_age
         self.minimum_energy = minimum_energy
         self.maximum_age = maximum_age
-        self.initial_energy = initial_energy
         self.type = "Deddian"
+        self.code = DEDDIAN
+        self.reset(unique_id, x, y, active, initial_energy)
+
+    def reset(self, unique_id, x, y, active, initial_energy):
+        self.unique_id = unique_id
+        self.pos = None
+        self.x = x
+        self.y = y
+        self.initial_energy = initial_energy
         self.energy = self.initial_energy
         self.age = 0
         self.active = active
         self.alive = 1
 
     def is_alive(self):
-        if self.age >= self.maximum_age:
-            self.alive = 0
-        if self.energy <= 0:
+        if self.alive == 1 and (self.age >= self.maximum_age or self.energy <= 0):
             self.alive = 0
+            self.model.deaths.append((self, self.unique_id))
+            self.model.step_deaths += 1
         return self.alive == 1
 
     def move(self):
@@ -201,8 +222,8 @@ class Deddian(Agent):
         if new_position is None:
             return
 
-        if self.model.grid.is_cell_empty((new_position[0], new_position[1])):
-            self.model.grid.move_agent(
+        if self.model.lattice[new_position[0], new_position[1]] == EMPTY:
+            self.model.move_agent(
                 self, (new_position[0], new_position[1]))
             self.x = new_position[0]
             self.y = new_position[1]
@@ -215,11 +236,12 @@ class Deddian(Agent):
             return
 
         if self.model.grid[x][y].alive != 0:
-            self.energy += self.model.grid[x][y].energy_value
+            change_energy(self, self.model.grid[x][y].energy_value)
+            self.model.step_deaths += 1
 
         self.model.delete_agent(self.model.grid[x][y])
 
-        self.model.grid.move_agent(self, (x, y))
+        self.model.move_agent(self, (x, y))
         self.x = x
         self.y = y
 
@@ -240,19 +262,12 @@ class Deddian(Agent):
 
         new_energy = self.energy // 2
 
-        new_agent = Deddian(self.model.next_id(), self.model,
-                            new_position[0], new_position[1], active=False, initial_energy=new_energy)
-        self.model.grid.place_agent(
-            new_agent, (new_position[0], new_position[1]))
-        self.model.schedule.add(new_agent)
-        self.energy = new_energy
+        self.model.new_agent(DEDDIAN, new_position[0], new_position[1],
+                             active=False, initial_energy=new_energy)
+        change_energy(self, new_energy - self.energy)
 
     def random_position(self):
-        empty_cells = []
-        for (x, y) in self.model.grid.iter_neighborhood(
-                self.pos, moore=False, include_center=False):
-            if self.model.grid.is_cell_empty((x, y)) or self.model.grid.get_cell_list_contents((x, y))[0].type == "Nonine":
-                empty_cells.append([x, y])
+        empty_cells = neighborhood_cells(self, (EMPTY, NONINE))
 
         if len(empty_cells) == 0:
             return None
@@ -264,17 +279,67 @@ class Deddian(Agent):
             self.move()
             self.reproduce()
             self.age += 1
-            self.energy -= self.energy_rate
+            change_energy(self, -self.energy_rate)
+
+
+'''
+    Slotted agent - CompactAgent
+
+    Same interface as the Mesa Agent (unique_id, model, pos, random) without
+    __dict__, for models with many short-lived agents.
+'''
+
+
+class CompactAgent:
+    __slots__ = ("unique_id", "model", "pos")
+
+    def __init__(self, unique_id, model):
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
+
+    @property
+    def random(self):
+        return self.model.random
+
+
+class Nonine(NonineBase, Agent):
+    pass
+
+
+class CompactNonine(NonineBase, CompactAgent):
+    __slots__ = ("x", "y", "initial_energy", "max_capacity", "energy_rate",
+                 "minimun_age", "rate_of_reproduction", "maximum_age",
+                 "energy_value", "probability_reproduce", "type", "code",
+                 "energy", "age", "alive", "active")
+
+
+class Deddian(DeddianBase, Agent):
+    pass
+
+
+class CompactDeddian(DeddianBase, CompactAgent):
+    __slots__ = ("x", "y", "max_capacity", "energy_rate",
+                 "probability_reproduce", "minimun_age", "minimum_energy",
+                 "maximum_age", "initial_energy", "type", "code", "energy",
+                 "age", "active", "alive")
+
+
+def neighborhood_cells(self, codes):
+    lattice = self.model.lattice
+    cells = self.model.neighbourhood.neighbours(self.pos)
+    return [[nx, ny] for (nx, ny) in cells if lattice[nx, ny] in codes]
 
 
 def random_position_empty(self):
-    empty_cells = []
-    for (x, y) in self.model.grid.iter_neighborhood(
-            self.pos, moore=False, include_center=False):
-        if self.model.grid.is_cell_empty((x, y)):
-            empty_cells.append([x, y])
+    empty_cells = neighborhood_cells(self, (EMPTY,))
 
     if len(empty_cells) == 0:
         return None
 
     return self.random.choice(empty_cells)
+
+
+def change_energy(self, amount):
+    self.energy += amount
+    self.model.total_energy[self.code] += amount
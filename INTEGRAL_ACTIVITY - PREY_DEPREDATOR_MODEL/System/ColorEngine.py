@@ -0,0 +1,84 @@
+'''
+
+    TC2008B - Prey - Depredator Model
+
+    Color-class engine of the planet Cenitune.
+
+    The array engine (AgentArrays) run by color classes: the lattice is
+    split in classes whose von Neumann neighbourhoods of radius 2 do not
+    overlap (COMMON/ColorClasses.py, 13 classes). An agent only touches
+    the cells at two steps of its cell (it moves one cell and then gives
+    birth next to its new cell), so all the agents of a type on the cells
+    of a class are updated as one batch without conflicts: every agent of
+    the batch gets the cell it picked (one round, see AgentArrays.rounds).
+
+    Each step, for each type (first the Deddians, then the Nonines), the
+    agents are grouped by the class of their cell once (a stable argsort
+    of the classes, cut with bincount) and the classes are visited in a
+    random order. An agent acts once per step, in the batch of the cell
+    where it started: an agent that moves to a cell of a class that is not
+    visited yet does not act again, and the agents born in the step are
+    not active.
+
+    Differences with the object model (random sequential order):
+        - The agents of a batch act as if they were consecutive in the
+          order, the order is random between the classes only.
+        - The agents of a type next to each other act in the order of
+          their classes, which changes every step.
+
+'''
+
+# Imports
+from System.ArrayEngine import AgentArrays, RADIUS
+from System.Agents import NONINE, DEDDIAN
+from COMMON.ColorClasses import color_classes
+import numpy as np
+
+'''
+    ColorArrays: Array engine run by color classes.
+
+    Parameters:
+        - model: Model (Cenitune) that owns the engine
+
+    Atributes:
+        - colors: Class of each cell
+        - classes: Number of classes
+        - color: Class of the current batch
+        - batches: Agents of the current type on the cells of each class
+
+'''
+
+
+class ColorArrays(AgentArrays):
+    def __init__(self, model):
+        super().__init__(model)
+        self.colors, self.classes = color_classes(self.width, self.height,
+                                                  RADIUS)
+        self.color = 0
+        self.batches = [np.zeros(0, dtype=np.int64)] * self.classes
+
+    def group(self, kind):
+        '''
+            Splits the agents of kind by the class of their cell (in the
+            order of their indices inside each class).
+        '''
+        members = super().members(kind)
+        colors = self.colors[self.x[members], self.y[members]]
+        ends = np.cumsum(np.bincount(colors, minlength=self.classes))
+        self.batches = np.split(members[np.argsort(colors, kind="stable")],
+                                ends[:-1])
+
+    def members(self, kind):
+        return self.batches[self.color]
+
+    def rounds(self, index):
+        # The agents of a batch are more than 2 * RADIUS steps apart
+        yield index
+
+    def step(self):
+        for kind, step in ((DEDDIAN, self.step_deddians),
+                           (NONINE, self.step_nonines)):
+            self.group(kind)
+            for color in self.rng.permutation(self.classes):
+                self.color = color
+                step()
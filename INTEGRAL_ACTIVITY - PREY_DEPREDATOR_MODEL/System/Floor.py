@@ -0,0 +1,201 @@
+'''
+
+    TC2008B - Prey - Depredator Model
+
+    Floor (herb field) of the planet Cenitune.
+
+    The herb of a cell is only computed when a Nonine reads it: the floor
+    keeps the herb of each cell at the step it was last written (grazed)
+    and the step of that write, and the herb at the current step is the
+    growth of that value over the elapsed steps. Growing the floor is just
+    advancing the clock, so it costs O(1) and allocates nothing.
+
+    By default the herb grows one unit per step without limit (the original
+    floor). The cap limits the herb of each cell (a number or an array with
+    a cap per cell) and growth replaces the growth of one unit per step:
+    growth(value, elapsed) -> value after elapsed steps (vectorized, and it
+    must give the same value growing the elapsed steps at once or in parts,
+    e.g. value + rate * elapsed or a closed form of the logistic growth).
+
+    With the default growth the herb of a cell is min(value - stamp +
+    clock, cap): it grows until a step known when it is written, and then
+    stays at its cap. The floor keeps the sums of the cells that grow and
+    of the caps of the full ones, and the cells that fill at each future
+    step, so the total herb is O(1) and each step only moves the cells that
+    fill in it. With a growth function the total is a pass over the floor.
+
+'''
+
+# Imports
+import math
+import numpy as np
+
+'''
+    Floor
+
+    Parameters:
+        - width: Width of the floor
+        - height: Height of the floor
+        - initial: Initial herb of each cell
+        - cap: Maximum herb of each cell (number or array), no limit if None
+        - growth: Function (value, elapsed) -> value, one unit per step if None
+        - value: Array for the herb of the last write (new if None)
+        - stamp: Array for the step of the last write (new if None)
+        - clock: Current step of the floor
+
+    Atributes:
+        - clock: Current step of the floor
+        - growing: Number of cells below their cap
+        - offset_sum: Sum of value - stamp of the cells below their cap
+        - capped_sum: Sum of the caps of the cells at their cap
+        - filling: Cells that reach their cap at each future step,
+          {step: [cells, offset_sum, cap_sum]}
+
+    The sums are only kept with the default growth. take_sums and add_sums
+    move them between floors (the tiles of the tiled engine report the
+    changes of their writes).
+
+'''
+
+
+class Floor:
+    def __init__(self, width, height, initial=0, cap=None, growth=None,
+                 value=None, stamp=None, clock=0):
+        if cap is not None and np.any(np.asarray(cap) < 0):
+            raise ValueError("The cap of the herb must be positive")
+
+        self.width = width
+        self.height = height
+        self.cap = cap
+        self.growth = growth
+        self.clock = clock
+        self.value = (np.zeros((width, height), dtype=np.float64)
+                      if value is None else value)
+        self.stamp = (np.zeros((width, height), dtype=np.int64)
+                      if stamp is None else stamp)
+        if value is None:
+            self.value.fill(initial)
+        self.growing = 0
+        self.offset_sum = 0.0
+        self.capped_sum = 0.0
+        self.filling = {}
+        if growth is None:
+            self.track(self.value - self.stamp, self.cap, 1)
+
+    def grow(self, steps=1):
+        for step in range(self.clock + 1, self.clock + steps + 1):
+            filled = self.filling.pop(step, None)
+            if filled is not None:
+                self.growing -= filled[0]
+                self.offset_sum -= filled[1]
+                self.capped_sum += filled[2]
+        self.clock += steps
+
+    def track(self, offset, cap, sign):
+        '''
+            Adds (sign 1) or removes (sign -1) cells of value - stamp offset
+            and cap cap to the sums.
+        '''
+        if cap is None:
+            self.growing += sign * np.size(offset)
+            self.offset_sum += sign * float(np.sum(offset))
+            return
+
+        if np.ndim(offset) == 0 and np.ndim(cap) == 0:
+            step = math.ceil(cap - offset)
+            if step <= self.clock:
+                self.capped_sum += sign * cap
+                return
+            self.growing += sign
+            self.offset_sum += sign * offset
+            filling = self.filling.setdefault(step, [0, 0.0, 0.0])
+            filling[0] += sign
+            filling[1] += sign * offset
+            filling[2] += sign * cap
+            return
+
+        offset, cap = np.broadcast_arrays(offset, cap)
+        step = np.ceil(cap - offset)
+        full = step <= self.clock
+        self.capped_sum += sign * float(cap[full].sum())
+        offset, cap, step = offset[~full], cap[~full], step[~full]
+        self.growing += sign * len(offset)
+        self.offset_sum += sign * float(offset.sum())
+        steps, index = np.unique(step, return_inverse=True)
+        cells = np.bincount(index)
+        offsets = np.bincount(index, offset)
+        caps = np.bincount(index, cap)
+        for step, count, offset, cap in zip(steps.tolist(), cells.tolist(),
+                                            offsets.tolist(), caps.tolist()):
+            filling = self.filling.setdefault(int(step), [0, 0.0, 0.0])
+            filling[0] += sign * count
+            filling[1] += sign * offset
+            filling[2] += sign * cap
+
+    def take_sums(self):
+        '''
+            Returns the sums and sets them to zero.
+        '''
+        sums = (self.growing, self.offset_sum, self.capped_sum, self.filling)
+        self.growing = 0
+        self.offset_sum = 0.0
+        self.capped_sum = 0.0
+        self.filling = {}
+        return sums
+
+    def add_sums(self, sums):
+        growing, offset_sum, capped_sum, filling = sums
+        self.growing += growing
+        self.offset_sum += offset_sum
+        self.capped_sum += capped_sum
+        for step, (count, offset, cap) in filling.items():
+            total = self.filling.setdefault(step, [0, 0.0, 0.0])
+            total[0] += count
+            total[1] += offset
+            total[2] += cap
+
+    def current(self, value, elapsed, cap):
+        if self.growth is None:
+            value = value + elapsed
+        else:
+            value = self.growth(value, elapsed)
+        if cap is not None:
+            value = np.minimum(value, cap)
+        return value
+
+    def cap_at(self, x, y):
+        if self.cap is None or np.ndim(self.cap) == 0:
+            return self.cap
+        return self.cap[x, y]
+
+    def read(self, x, y):
+        '''
+            Herb of the cells (x, y) at the current step (numbers or arrays).
+        '''
+        return self.current(self.value[x, y], self.clock - self.stamp[x, y],
+                            self.cap_at(x, y))
+
+    def write(self, x, y, herb):
+        '''
+            Sets the herb of the cells (x, y) (distinct cells) at the
+            current step.
+        '''
+        if self.growth is None:
+            offset = self.value[x, y] - self.stamp[x, y]
+            if self.cap is None:
+                # The cells keep growing, only their offsets change
+                self.offset_sum += float(np.sum(herb - self.clock - offset))
+            else:
+                cap = self.cap_at(x, y)
+                self.track(offset, cap, -1)
+                self.track(herb - self.clock, cap, 1)
+        self.value[x, y] = herb
+        self.stamp[x, y] = self.clock
+
+    def to_array(self):
+        return self.current(self.value, self.clock - self.stamp, self.cap)
+
+    def total(self):
+        if self.growth is None:
+            return self.offset_sum + self.growing * self.clock + self.capped_sum
+        return float(self.to_array().sum())
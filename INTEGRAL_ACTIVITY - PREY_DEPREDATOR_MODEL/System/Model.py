@@ -11,7 +11,19 @@
 '''
 
 # Imports
-from System.Agents import Nonine, Deddian
+from System.Agents import Nonine, Deddian, CompactNonine, CompactDeddian
+from System.Agents import EMPTY, NONINE, DEDDIAN, NEIGHBORHOOD
+from System.ArrayEngine import AgentArrays
+from System.TiledEngine import TiledAgents
+from System.ColorEngine import ColorArrays
+from System.Floor import Floor
+from System import Agents
+from COMMON.Recorder import FrameRecorder
+from COMMON.FrameStore import FrameStore
+from COMMON import Checkpoint
+from COMMON.Placement import sample_cells
+from COMMON.Raster import Rasterizer, positions, attribute
+from COMMON.Neighbourhood import neighbourhood_table
 from mesa import Model
 from mesa.time import RandomActivationByType, RandomActivation
 from mesa.space import SingleGrid
@@ -27,95 +39,497 @@ import numpy as np
         - initial_nonines: Initial number of Nonines
         - initial_deddians: Initial number of Deddians
         - initial_herb: Initial number of Herb
+        - engine: "object" (Mesa agents, reference), "array" (AgentArrays),
+          "color" (ColorArrays, batches by color classes) or "tiled"
+          (TiledAgents, one process per stripe of rows)
+        - recorder: Recorder of the grids (FrameRecorder by default), a
+          FrameStore gets the grids drawn in its frames (no copies)
+        - compact: Use the slotted agents (CompactNonine, CompactDeddian)
+        - nonine_parameters: Parameters of the Nonines (energy_rate, ...)
+        - deddian_parameters: Parameters of the Deddians (energy_rate, ...)
+        - seed: Seed of the model, drives all its randomness (random if None)
+        - stop_conditions: StopConditions checked after each step
+        - profiler: Profiler that times the phases of the steps (see instrument)
+        - tiles: Number of stripes of the tiled engine (all the cores if None)
+        - herb_cap: Maximum herb of each cell (number or array), no limit if None
+        - herb_growth: Growth of the herb, (value, elapsed) -> value (see Floor)
+        - herb_every: Steps between two totals of the Herb reporter with a
+          herb_growth (a pass over the floor), the other steps repeat the
+          last total
 
     Atributes:
         - schedule: Schedule of the model
         - grid: Grid of the model
         - datacollector: Datacollector of the model
-        - floor: Floor of the model(with herb)
+        - recorder: Recorder of the grid of each step
+        - frame: Buffer (uint8) where the grid of each step is drawn
+        - floor: Floor of the model(with herb), grown lazily (see Floor)
         - current_id: Current ID of the model
+        - current_step: Number of steps of the model (every engine)
+        - last_herb: Last total of the Herb reporter (None before the first)
+        - rng: NumPy generator of the model (seeded from self.random)
+        - lattice: Type of the agent in each cell (EMPTY, NONINE, DEDDIAN)
+        - neighbourhood: Table of the neighbours of each cell (NEIGHBORHOOD)
+        - agents: State of the agents in the array, color and tiled engines
+          (None otherwise)
+        - agent_types: Class of the agents of each type code
+        - agent_parameters: Parameters of the agents of each type code
+        - pool: Deleted agents of each type code, reused for the newborns
+        - running: False once a stop condition is met
+        - stop_reason: Reason of the stop condition met (None while running)
+        - profiler: Profiler of the model (None if not instrumented)
+        - newborns: Agents born in the current step (activated on the next)
+        - deaths: Agents that died in the current step, (agent, unique_id)
+        - population: Number of agents of each type code on the grid
+        - total_energy: Sum of the energy of the agents of each type code
+        - herb: Total herb of the floor (property)
+        - step_births: Agents born in the last step
+        - step_deaths: Agents that died (old, starved or eaten) in the last step
+
+    The counters (population, total_energy, step_births, step_deaths) are
+    updated where the agents change and the floor keeps the sums of its
+    herb, so the reporters of the datacollector (REPORTERS) cost O(1) per
+    step (with a growth the herb is a pass over the floor, every herb_every
+    steps).
 
 '''
 
 
 class Cenitune(Model):
     def __init__(self, width=35, height=35, initial_nonines=47, initial_deddians=15,
-            initial_herb=20):
+            initial_herb=20, engine="object", recorder=None, compact=False,
+            nonine_parameters=None, deddian_parameters=None, seed=None,
+            stop_conditions=None, profiler=None, tiles=None, herb_cap=None,
+            herb_growth=None, herb_every=10):
+        if engine not in ("object", "array", "color", "tiled"):
+            raise ValueError("Unknown engine: %s" % engine)
+        if herb_every < 1:
+            raise ValueError("herb_every must be at least 1")
+
         self.width = width
         self.height = height
         self.num_nonines = initial_nonines
         self.num_dedians = initial_deddians
         self.num_herb = initial_herb
+        self.herb_every = herb_every
+        self.last_herb = None
         self.current_id = 0
+        self.current_step = 0
+        self.engine = engine
+        self.stop_conditions = stop_conditions
+        self.running = True
+        self.stop_reason = None
+        self.profiler = None
+        self.agents = None
+        self.rng = np.random.default_rng(self.random.getrandbits(64))
+        if compact:
+            self.agent_types = {NONINE: CompactNonine, DEDDIAN: CompactDeddian}
+        else:
+            self.agent_types = {NONINE: Nonine, DEDDIAN: Deddian}
+        self.agent_parameters = {NONINE: dict(nonine_parameters or {}),
+                                 DEDDIAN: dict(deddian_parameters or {})}
+        self.pool = {NONINE: [], DEDDIAN: []}
+        self.newborns = []
+        self.deaths = []
+        self.population = {NONINE: 0, DEDDIAN: 0}
+        self.total_energy = {NONINE: 0.0, DEDDIAN: 0.0}
+        self.step_births = 0
+        self.step_deaths = 0
 
-        self.floor = np.zeros((self.width, self.height))
-        self.floor.fill(self.num_herb)
+        self.floor = Floor(self.width, self.height, self.num_herb, herb_cap,
+                           herb_growth)
 
         self.grid = SingleGrid(self.width, self.height, False)
+        self.lattice = np.zeros((self.width, self.height), dtype=np.int8)
+        self.neighbourhood = neighbourhood_table(self.width, self.height,
+                                                 offsets=NEIGHBORHOOD)
 
         self.schedule = RandomActivationByType(self)
-        self.datacollector = DataCollector(
-            model_reporters={"Grid": get_grid}
-        )
+        self.datacollector = DataCollector(model_reporters=REPORTERS)
+        self.recorder = FrameRecorder() if recorder is None else recorder
+        self.frame = np.zeros((self.width, self.height), dtype=np.uint8)
+
+        if self.engine != "object":
+            if self.engine == "array":
+                self.agents = AgentArrays(self)
+            elif self.engine == "color":
+                self.agents = ColorArrays(self)
+            else:
+                self.agents = TiledAgents(self, tiles)
+            self.agents.fill(DEDDIAN, self.num_dedians)
+            self.agents.fill(NONINE, self.num_nonines)
+        else:
+            fill_agents(self, DEDDIAN, self.num_dedians)
+            fill_agents(self, NONINE, self.num_nonines)
+
+        if profiler is not None:
+            self.instrument(profiler)
+
+    def instrument(self, profiler):
+        '''
+            Times the phases of the step and the methods of the agents. The
+            methods of the agent classes are replaced for every model until
+            profiler.restore() is called.
+        '''
+        self.profiler = profiler
+        profiler.instrument(self, ["step"], "Cenitune")
+        profiler.instrument(self.datacollector, ["collect"], "datacollector")
+        profiler.instrument(self.recorder, ["record"], "recorder")
+        profiler.instrument(self, ["clean_deaths", "activate", "grow"])
+
+        if self.engine == "tiled":
+            profiler.instrument(self.agents, ["step"], "agents")
+            profiler.instrument(self.agents, ["round"])
+            return
 
-        fill_agents(self, Deddian, self.num_dedians)
-        fill_agents(self, Nonine, self.num_nonines)
+        if self.agents is not None:
+            profiler.instrument(self.agents, ["step"], "agents")
+            profiler.instrument(self.agents, ["step_deddians", "step_nonines",
+                                              "settle", "give_birth"])
+            return
+
+        profiler.instrument(self.schedule, ["step"], "schedule")
+        for Agent in self.agent_types.values():
+            profiler.instrument(Agent, ["step", "is_alive", "move", "eat",
+                                        "reproduce"],
+                                Agent.__name__)
+        profiler.instrument(self.agent_types[DEDDIAN], ["random_position"],
+                            self.agent_types[DEDDIAN].__name__)
+        profiler.instrument(Agents, ["random_position_empty",
+                                     "neighborhood_cells"])
+
+    @property
+    def herb(self):
+        return self.floor.total()
 
     def grow(self):
-        ones = np.ones((self.width, self.height))
-        self.floor = np.add(self.floor, ones)
+        if self.engine == "tiled":
+            self.agents.grow()
+            return
+
+        self.floor.grow()
 
     def next_id(self):
         self.current_id += 1
         return self.current_id
 
     def activate(self):
-        for agent in self.schedule.agents:
-            if agent.active == False:
-                agent.active = True
+        if self.agents is not None:
+            self.agents.activate()
+            return
+
+        for agent in self.newborns:
+            agent.active = True
+        self.newborns.clear()
 
     def clean_deaths(self):
-        for agent in self.schedule.agents:
-            if agent.alive == 0:
+        if self.agents is not None:
+            self.agents.clean_deaths()
+            return
+
+        # Skip the agents already deleted (eaten) and maybe reused
+        for agent, unique_id in self.deaths:
+            if agent.unique_id == unique_id and agent.pos is not None:
                 self.delete_agent(agent)
+        self.deaths.clear()
 
     def finish(self):
         return self.grid.exists_empty_cells()
 
     def step(self):
         self.datacollector.collect(self)
+        self.step_births = 0
+        self.step_deaths = 0
+        if isinstance(self.recorder, FrameStore):
+            self.recorder.draw(lambda out: get_grid(self, out),
+                               self.frame.shape)
+        else:
+            self.recorder.record(get_grid(self, self.frame))
         self.clean_deaths()
         self.activate()
-        self.schedule.step(False, True)
+        if self.agents is not None:
+            self.agents.step()
+        else:
+            self.schedule.step(False, True)
         self.grow()
+        self.current_step += 1
+
+        if self.stop_conditions is not None:
+            self.stop_reason = self.stop_conditions.check(self)
+            self.running = self.stop_reason is None
+
+    def place_agent(self, agent, pos):
+        self.grid.place_agent(agent, pos)
+        self.lattice[pos] = agent.code
+        self.population[agent.code] += 1
+        self.total_energy[agent.code] += agent.energy
+
+    def place_agents(self, agents):
+        '''
+            Places (and schedules) a batch of new agents of the same type in
+            their cells (agent.x, agent.y).
+        '''
+        if not agents:
+            return
+        code = agents[0].code
+        for agent in agents:
+            self.grid.place_agent(agent, (agent.x, agent.y))
+            self.schedule.add(agent)
+        x = [agent.x for agent in agents]
+        y = [agent.y for agent in agents]
+        self.lattice[x, y] = code
+        self.population[code] += len(agents)
+        self.total_energy[code] += sum(agent.energy for agent in agents)
+
+    def move_agent(self, agent, pos):
+        self.lattice[agent.pos] = EMPTY
+        self.grid.move_agent(agent, pos)
+        self.lattice[pos] = agent.code
+
+    def new_agent(self, code, x, y, active, initial_energy):
+        pool = self.pool[code]
+        if pool:
+            agent = pool.pop()
+            agent.reset(self.next_id(), x, y, active, initial_energy)
+        else:
+            parameters = dict(self.agent_parameters[code], active=active,
+                              initial_energy=initial_energy)
+            agent = self.agent_types[code](self.next_id(), self, x, y,
+                                           **parameters)
+        self.place_agent(agent, (x, y))
+        self.schedule.add(agent)
+        if not active:
+            self.newborns.append(agent)
+        self.step_births += 1
+        return agent
 
     def delete_agent(self, agent):
+        self.population[agent.code] -= 1
+        self.total_energy[agent.code] -= agent.energy
+        self.lattice[agent.pos] = EMPTY
         self.grid.remove_agent(agent)
         self.schedule.remove(agent)
+        self.pool[agent.code].append(agent)
+
+
+# Frame of the planet: 3 Nonine, 5 Deddian, 0 empty cell (or dead agent)
+RASTERIZER = Rasterizer({NONINE: 3, DEDDIAN: 5})
+
+
+def get_grid(model, out=None):
+    if out is None:
+        grid = np.zeros((model.width, model.height))
+    else:
+        grid = out
+
+    if model.engine == "tiled":
+        x, y, kinds = model.agents.cells()
+    elif model.agents is not None:
+        agents = model.agents
+        shown = np.flatnonzero((agents.alive == 1) & ~agents.removed)
+        x, y, kinds = agents.x[shown], agents.y[shown], agents.type[shown]
+    else:
+        agents = model.schedule.agents
+        x, y = positions(agents)
+        kinds = np.where(attribute(agents, "alive") == 1,
+                         attribute(agents, "code"), EMPTY)
+    return RASTERIZER.draw(grid, x, y, kinds)
+
+
+def get_population(model):
+    return model.population[NONINE], model.population[DEDDIAN]
+
+
+def get_herb(model):
+    if (model.floor.growth is None or model.last_herb is None or
+            model.current_step % model.herb_every == 0):
+        model.last_herb = model.herb
+    return model.last_herb
+
+
+def get_mean_energy(model, code):
+    if model.population[code] == 0:
+        return 0.0
+    return model.total_energy[code] / model.population[code]
+
+
+# Model reporters of the datacollector (read the counters of the model)
+REPORTERS = {
+    "Nonines": lambda model: model.population[NONINE],
+    "Deddians": lambda model: model.population[DEDDIAN],
+    "Herb": get_herb,
+    "Mean energy Nonines": lambda model: get_mean_energy(model, NONINE),
+    "Mean energy Deddians": lambda model: get_mean_energy(model, DEDDIAN),
+    "Births": "step_births",
+    "Deaths": "step_deaths",
+}
+
+
+def is_full(model):
+    return sum(get_population(model)) >= model.width * model.height
+
+
+def fill_agents(model, code, number):
+    Agent = model.agent_types[code]
+    xs, ys = sample_cells(model.rng, model.lattice == EMPTY, number)
+    model.place_agents([Agent(model.next_id(), model, x, y,
+                              **model.agent_parameters[code])
+                        for x, y in zip(xs.tolist(), ys.tolist())])
+
+
+def get_state(model):
+    '''
+        State of the model as (arrays, metadata), see COMMON/Checkpoint.py.
+        The recorder, the stop conditions, the profiler and the growth of the
+        herb are not part of the state.
+    '''
+    random_internal, random_metadata = Checkpoint.random_state(model.random)
+    series, series_names = Checkpoint.series_state(model.datacollector)
+    arrays = dict(series, floor_value=model.floor.value.copy(),
+                  floor_stamp=model.floor.stamp.copy(), random=random_internal)
+    if model.floor.cap is not None:
+        arrays["herb_cap"] = np.asarray(model.floor.cap)
+    metadata = {
+        "arguments": {"width": model.width, "height": model.height,
+                      "initial_nonines": model.num_nonines,
+                      "initial_deddians": model.num_dedians,
+                      "initial_herb": model.num_herb,
+                      "herb_every": model.herb_every,
+                      "engine": model.engine,
+                      "compact": model.agent_types[NONINE] is CompactNonine,
+                      "nonine_parameters": model.agent_parameters[NONINE],
+                      "deddian_parameters": model.agent_parameters[DEDDIAN]},
+        "seed": model._seed,
+        "random": random_metadata,
+        "rng": Checkpoint.generator_state(model.rng),
+        "series": series_names,
+        "current_id": model.current_id,
+        "current_step": model.current_step,
+        "last_herb": model.last_herb,
+        "steps": model.schedule.steps,
+        "running": model.running,
+        "stop_reason": model.stop_reason,
+        "population": [model.population[NONINE], model.population[DEDDIAN]],
+        "total_energy": [model.total_energy[NONINE],
+                         model.total_energy[DEDDIAN]],
+        "clock": model.floor.clock,
+        "step_births": model.step_births,
+        "step_deaths": model.step_deaths,
+    }
+
+    if model.engine == "tiled":
+        # Agents in the order of the tiles, with the generators of the tiles
+        values, states = model.agents.gather()
+        for column, value in values.items():
+            arrays["agents_" + column] = value
+        metadata["arguments"]["tiles"] = len(states)
+        metadata["tiles_rng"] = states
+        return arrays, metadata
+
+    if model.agents is not None:
+        for column in list(model.agents.columns) + ["cell"]:
+            arrays["agents_" + column] = getattr(model.agents, column).copy()
+        return arrays, metadata
+
+    # Agents in the order of the schedule (the order of the shuffles)
+    agents = model.schedule.agents
+    arrays.update(
+        agents_code=np.array([agent.code for agent in agents], dtype=np.int8),
+        agents_id=np.array([agent.unique_id for agent in agents],
+                           dtype=np.int64),
+        agents_x=np.array([agent.x for agent in agents], dtype=np.int64),
+        agents_y=np.array([agent.y for agent in agents], dtype=np.int64),
+        agents_energy=np.array([agent.energy for agent in agents],
+                               dtype=np.float64),
+        agents_initial_energy=np.array([agent.initial_energy
+                                        for agent in agents], dtype=np.float64),
+        agents_age=np.array([agent.age for agent in agents], dtype=np.int64),
+        agents_alive=np.array([agent.alive for agent in agents], dtype=np.int8),
+        agents_active=np.array([agent.active for agent in agents], dtype=bool))
+    codes = {Agent: code for code, Agent in model.agent_types.items()}
+    metadata["types"] = [codes[Agent] for Agent in model.schedule.agents_by_type]
+    return arrays, metadata
+
+
+def from_state(arrays, metadata, recorder=None, stop_conditions=None,
+               profiler=None, herb_growth=None):
+    arguments = dict(metadata["arguments"], initial_nonines=0,
+                     initial_deddians=0)
+    cap = arrays.get("herb_cap")
+    if cap is not None and cap.ndim == 0:
+        cap = float(cap)
+    model = Cenitune(recorder=recorder, seed=metadata["seed"],
+                     stop_conditions=stop_conditions, herb_cap=cap,
+                     herb_growth=herb_growth, **arguments)
+    model.num_nonines = metadata["arguments"]["initial_nonines"]
+    model.num_dedians = metadata["arguments"]["initial_deddians"]
+    model.floor = Floor(model.width, model.height, cap=cap,
+                        growth=herb_growth,
+                        value=arrays["floor_value"].copy(),
+                        stamp=arrays["floor_stamp"].copy(),
+                        clock=metadata["clock"])
+
+    if model.engine == "tiled":
+        values = {name[len("agents_"):]: array.copy()
+                  for name, array in arrays.items()
+                  if name.startswith("agents_")}
+        model.agents.restore(model.floor, values, metadata["tiles_rng"])
+    elif model.agents is not None:
+        for column in model.agents.columns:
+            setattr(model.agents, column, arrays["agents_" + column].copy())
+        model.agents.cell[...] = arrays["agents_cell"]
+    else:
+        # Same order of the types as in the schedule of the checkpoint
+        for code in metadata["types"]:
+            model.schedule.agents_by_type[model.agent_types[code]]
+        for index in range(len(arrays["agents_id"])):
+            code = int(arrays["agents_code"][index])
+            x = int(arrays["agents_x"][index])
+            y = int(arrays["agents_y"][index])
+            agent = model.agent_types[code](
+                int(arrays["agents_id"][index]), model, x, y,
+                active=bool(arrays["agents_active"][index]),
+                initial_energy=float(arrays["agents_initial_energy"][index]),
+                **model.agent_parameters[code])
+            agent.energy = float(arrays["agents_energy"][index])
+            agent.age = int(arrays["agents_age"][index])
+            agent.alive = int(arrays["agents_alive"][index])
+            model.place_agent(agent, (x, y))
+            model.schedule.add(agent)
+            if not agent.active:
+                model.newborns.append(agent)
+            if agent.alive != 1:
+                model.deaths.append((agent, agent.unique_id))
+
+    model.current_id = metadata["current_id"]
+    model.current_step = metadata.get("current_step", metadata["steps"])
+    model.last_herb = metadata.get("last_herb")
+    model.schedule.steps = model.schedule.time = metadata["steps"]
+    model.running = metadata["running"]
+    model.stop_reason = metadata["stop_reason"]
+    model.population = {NONINE: metadata["population"][0],
+                        DEDDIAN: metadata["population"][1]}
+    model.total_energy = {NONINE: metadata["total_energy"][0],
+                          DEDDIAN: metadata["total_energy"][1]}
+    model.step_births = metadata["step_births"]
+    model.step_deaths = metadata["step_deaths"]
+    Checkpoint.set_series_state(model.datacollector, arrays,
+                                metadata["series"])
+    Checkpoint.set_random_state(model.random, arrays["random"],
+                                metadata["random"])
+    Checkpoint.set_generator_state(model.rng, metadata["rng"])
+
+    if profiler is not None:
+        model.instrument(profiler)
+    return model
+
+
+def save_checkpoint(model, path, compress=False):
+    Checkpoint.save(path, *get_state(model), compress=compress)
 
 
-def get_grid(model):
-    grid = np.zeros((model.width, model.height))
-
-    for (content, x, y) in model.grid.coord_iter():
-        if content is None:
-            continue
-        elif content.alive != 1:
-            continue
-        elif content.type == "Nonine":
-            grid[x][y] = 3
-            continue
-        elif content.type == "Deddian":
-            grid[x][y] = 5
-    return grid
-
-
-def fill_agents(model, Agent, number):
-    while number > 0:
-        x = np.random.randint(0, model.grid.width)
-        y = np.random.randint(0, model.grid.height)
-        if model.grid.is_cell_empty((x, y)):
-            new_agent = Agent(model.next_id(), model, x, y)
-            model.grid.place_agent(new_agent, (x, y))
-            model.schedule.add(new_agent)
-            number -= 1
+def load_checkpoint(path, recorder=None, stop_conditions=None, profiler=None,
+                    herb_growth=None):
+    arrays, metadata = Checkpoint.load(path)
+    return from_state(arrays, metadata, recorder, stop_conditions, profiler,
+                      herb_growth)
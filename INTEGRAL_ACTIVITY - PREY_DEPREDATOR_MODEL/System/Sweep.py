@@ -0,0 +1,135 @@
+'''
+
+    TC2008B - Prey - Depredator Model
+
+    Parallel parameter sweep of the planet Cenitune.
+
+    Runs one Cenitune for each combination of a parameter grid and each
+    seed in a pool of processes, receives the population of each step of
+    every run (Nonines, Deddians) and saves all of them in one .npz file.
+    With a ResultCache, the runs already computed are read from the cache.
+
+    Keys of the parameter grid:
+        - Parameters of Cenitune: "initial_nonines", "initial_herb", ...
+        - Parameters of the agents: "nonine.energy_rate",
+          "deddian.maximum_age", ...
+
+'''
+
+# Imports
+from System.Model import Cenitune, get_population
+from COMMON.Recorder import NullRecorder
+import itertools
+import json
+import multiprocessing
+import numpy as np
+
+
+def parameter_grid(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values))
+            for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def model_arguments(parameters):
+    arguments = {"nonine_parameters": {}, "deddian_parameters": {}}
+    for key, value in parameters.items():
+        if "." in key:
+            agent, name = key.split(".", 1)
+            arguments[agent + "_parameters"][name] = value
+        else:
+            arguments[key] = value
+    return arguments
+
+
+def run_configuration(task):
+    index, parameters, seed, steps, engine = task
+    # Only the populations are kept, not the grids
+    model = Cenitune(engine=engine, seed=seed, recorder=NullRecorder(),
+                     **model_arguments(parameters))
+
+    populations = np.zeros((steps, 2), dtype=np.int32)
+    for step in range(steps):
+        model.step()
+        populations[step] = get_population(model)
+    return index, populations
+
+
+'''
+    Parameters:
+        - grid: Values of each parameter, {name: [values]}
+        - seeds: Seeds of the runs of each combination
+        - steps: Number of steps of each run
+        - path: Path of the .npz file with the results (not saved if None)
+        - processes: Number of processes (all the cores if None)
+        - engine: Engine of the models ("object" or "array")
+        - callback: Function called with (done, total) after each run
+        - cache: ResultCache with the populations of previous runs
+
+    Returns a dictionary with:
+        - parameters: Parameters of each run
+        - seeds: Seed of each run
+        - populations: (runs, steps, 2) Nonines and Deddians of each step
+'''
+
+
+def sweep(grid, seeds, steps=200, path=None, processes=None, engine="object",
+          callback=None, cache=None):
+    configurations = parameter_grid(grid)
+    runs = [(parameters, seed)
+            for parameters in configurations for seed in seeds]
+    tasks = [(index, parameters, seed, steps, engine)
+             for index, (parameters, seed) in enumerate(runs)]
+
+    populations = np.zeros((len(runs), steps, 2), dtype=np.int32)
+    done = 0
+    pending = tasks
+    if cache is not None:
+        pending = []
+        for task in tasks:
+            stored = cache.get(Cenitune, cache_parameters(task), task[2])
+            if stored is None:
+                pending.append(task)
+                continue
+            populations[task[0]] = stored["populations"]
+            done += 1
+
+    if pending:
+        processes = min(processes or multiprocessing.cpu_count(), len(pending))
+        chunksize = max(1, len(pending) // (processes * 4))
+        with multiprocessing.Pool(processes) as pool:
+            for index, series in pool.imap_unordered(run_configuration,
+                                                     pending, chunksize):
+                populations[index] = series
+                if cache is not None:
+                    task = tasks[index]
+                    cache.put(Cenitune, cache_parameters(task), task[2],
+                              {"populations": series})
+                done += 1
+                if callback is not None:
+                    callback(done, len(runs))
+
+    result = {"parameters": [parameters for parameters, _ in runs],
+              "seeds": np.array([seed for _, seed in runs], dtype=np.int64),
+              "populations": populations}
+    if path is not None:
+        save(path, result)
+    return result
+
+
+def cache_parameters(task):
+    _, parameters, _, steps, engine = task
+    return dict(parameters, steps=steps, engine=engine)
+
+
+def save(path, result):
+    np.savez_compressed(path, parameters=json.dumps(result["parameters"]),
+                        seeds=result["seeds"],
+                        populations=result["populations"])
+
+
+def load(path):
+    with np.load(path) as data:
+        return {"parameters": json.loads(str(data["parameters"])),
+                "seeds": data["seeds"],
+                "populations": data["populations"]}
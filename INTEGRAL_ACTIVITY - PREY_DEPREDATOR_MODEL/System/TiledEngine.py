@@ -0,0 +1,522 @@
+'''
+
+    TC2008B - Prey - Depredator Model
+
+    Tiled multi-process engine of the planet Cenitune.
+
+    The world is split in stripes of rows, one per worker process. The type
+    and alive state of the agent of each cell and the arrays of the floor
+    (Floor) live in shared memory, and each worker keeps the agents of its stripe
+    in a TileArrays (the array engine over its rows plus the row of each
+    neighbour stripe next to them, the halo).
+
+    Each step runs in rounds. Every worker runs the round and waits for the
+    others (the pipes to the coordinator are the barrier):
+        - begin: Clean the deaths and activate the newborns
+        - Deddians of the lower half of each stripe, then of the upper half
+        - Nonines of the lower half of each stripe, then of the upper half
+        - grow: Grow the floor and report the counters of the stripe
+
+    An agent touches cells up to two rows away from its cell (it moves one
+    cell and then gives birth next to its new cell), but its tile only
+    holds one row of each neighbour (the halo, further cells are outside
+    for it). With halves of at least three rows (MINIMUM_ROWS), while the
+    lower halves act the upper halves keep them apart (and the other way
+    around): the agents of a half reach two rows into the other half of
+    their stripe, the ones of the next stripe only its halo row, so two
+    workers never touch the same cells in the same round. Before a round a
+    worker copies the halo row that its agents can reach from the shared
+    lattice (the agents of the neighbour, as ghosts that do not act), and
+    after the round it writes back the rows that it could change. The
+    agents that moved to (or were born in) the halo are sent to the owner
+    of the row with the next round, and an agent whose cell changed its
+    type was eaten by an agent of the neighbour.
+
+    The checkpoints (get_state, from_state) gather the agents of the tiles
+    and the states of their generators (gather), and give them back to the
+    tiles of the new model (restore).
+
+    Differences with the array engine (AgentArrays):
+        - The lower and upper halves of the stripes act in different rounds.
+        - Every worker has its own random generator, so the populations
+          match the array engine statistically, not step by step.
+
+'''
+
+# Imports
+from System.Agents import Nonine, Deddian, EMPTY, NONINE, DEDDIAN
+from System.ArrayEngine import AgentArrays, COLUMNS, defaults
+from System.Floor import Floor
+from COMMON.Placement import sample_cells
+from multiprocessing import shared_memory
+import multiprocessing
+import weakref
+import numpy as np
+
+# Minimum number of rows of each stripe: the halves need three rows, so the
+# cells touched by the agents of a lower half (two rows up) and by the agents
+# of the next stripe (its halo row) never meet
+MINIMUM_ROWS = 6
+
+
+def shared_array(memory, shape, dtype):
+    return np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+'''
+    TileArrays: Array engine of the agents of a stripe (local rows).
+
+    Parameters:
+        - tile: Tile that owns the engine
+
+    Atributes:
+        - acted: Agents that already acted in the current step
+        - window: Local rows of the agents that act in the current round
+
+'''
+
+
+class TileArrays(AgentArrays):
+    columns = dict(COLUMNS, acted=bool)
+
+    def __init__(self, tile):
+        super().__init__(tile)
+        self.window = (0, 0)
+
+    def members(self, kind):
+        start, stop = self.window
+        members = np.flatnonzero((self.type == kind) & ~self.removed &
+                                 ~self.acted & (self.x >= start) &
+                                 (self.x < stop))
+        self.acted[members] = True
+        return members
+
+    def drop(self, gone):
+        index = np.flatnonzero(gone)
+        own = self.cell[self.x[index], self.y[index]] == index
+        self.cell[self.x[index[own]], self.y[index[own]]] = -1
+        self.select(~gone)
+
+
+'''
+    Tile: Worker of a stripe of rows [low, high) of the world.
+
+    Parameters:
+        - specification: Dictionary with index, low, middle, high, width,
+          height, names of the shared blocks (kind, alive, value and
+          stamp of the floor), cap, growth and clock of the floor,
+          agent_parameters and seed of the tile
+
+    Atributes:
+        - origin: Row of the world of the first local row
+        - kind, alive: Shared lattices of the type and alive state
+        - floor: Floor over the local rows of the shared floor (its sums
+          are the changes of the current step)
+        - agents: TileArrays of the agents of the stripe
+        - step_births, step_deaths: Counters of the current step
+
+'''
+
+
+class Tile:
+    def __init__(self, specification):
+        self.index = specification["index"]
+        self.low = specification["low"]
+        self.middle = specification["middle"]
+        self.high = specification["high"]
+        self.world_width = specification["width"]
+        self.height = specification["height"]
+        shape = (self.world_width, self.height)
+
+        self.memory = [shared_memory.SharedMemory(name=name)
+                       for name in specification["memory"]]
+        self.kind = shared_array(self.memory[0], shape, np.int8)
+        self.alive = shared_array(self.memory[1], shape, np.int8)
+        value = shared_array(self.memory[2], shape, np.float64)
+        stamp = shared_array(self.memory[3], shape, np.int64)
+
+        self.origin = max(self.low - 1, 0)
+        end = min(self.high + 1, self.world_width)
+        self.width = end - self.origin
+        cap = specification["cap"]
+        if cap is not None and np.ndim(cap) > 0:
+            cap = cap[self.origin:end]
+        self.floor = Floor(self.width, self.height, cap=cap,
+                           growth=specification["growth"],
+                           value=value[self.origin:end],
+                           stamp=stamp[self.origin:end],
+                           clock=specification["clock"])
+        self.floor.take_sums()
+        self.rng = np.random.default_rng(specification["seed"])
+        self.agent_parameters = specification["agent_parameters"]
+
+        # Counters of the model (the array engine updates them)
+        self.population = {NONINE: 0, DEDDIAN: 0}
+        self.total_energy = {NONINE: 0.0, DEDDIAN: 0.0}
+        self.step_births = 0
+        self.step_deaths = 0
+        self.agents = TileArrays(self)
+
+    def run(self, command, argument, immigrants):
+        self.reconcile()
+        self.receive(immigrants)
+
+        stats = None
+        if command == "begin":
+            self.begin()
+        elif command == "act":
+            self.act(*argument)
+        elif command == "grow":
+            stats = self.grow()
+        elif command == "gather":
+            stats = self.gather()
+        elif command == "restore":
+            self.restore(argument)
+        return self.emigrate(), stats
+
+    def receive(self, values):
+        if values is None or len(values["x"]) == 0:
+            return
+        values = dict(values, x=values["x"] - self.origin)
+        self.agents.append(values)
+
+    def reconcile(self):
+        '''
+            Drops the agents whose cell changed its type (eaten by an agent
+            of a neighbour stripe).
+        '''
+        agents = self.agents
+        eaten = self.kind[agents.x + self.origin, agents.y] != agents.type
+        if eaten.any():
+            agents.drop(eaten)
+
+    def begin(self):
+        agents = self.agents
+        dead = agents.alive != 1
+        agents.drop(dead | agents.removed)
+        agents.activate()
+        agents.acted.fill(False)
+        self.step_births = 0
+        self.step_deaths = 0
+        self.publish(self.low, self.high)
+
+    def act(self, kind, half):
+        start, stop = ((self.low, self.middle) if half == 0 else
+                       (self.middle, self.high))
+        top = max(start - 1, 0)
+        bottom = min(stop + 1, self.world_width)
+        self.pull(top, bottom)
+
+        self.agents.window = (start - self.origin, stop - self.origin)
+        if kind == DEDDIAN:
+            self.agents.step_deddians()
+        else:
+            self.agents.step_nonines()
+        self.publish(top, bottom)
+
+    def pull(self, top, bottom):
+        '''
+            Adds the agents of the rows of the neighbours in [top, bottom)
+            as ghosts (removed, they do not act).
+        '''
+        for row in range(top, bottom):
+            if self.low <= row < self.high:
+                continue
+            y = np.flatnonzero(self.kind[row] != EMPTY)
+            number = len(y)
+            self.agents.append({"x": np.full(number, row - self.origin),
+                                "y": y,
+                                "type": self.kind[row, y],
+                                "alive": self.alive[row, y],
+                                "removed": np.ones(number, dtype=bool),
+                                "acted": np.ones(number, dtype=bool)})
+
+    def publish(self, top, bottom):
+        content = self.agents.cell[top - self.origin:bottom - self.origin]
+        occupied = content >= 0
+        kind = np.zeros(content.shape, dtype=np.int8)
+        alive = np.zeros(content.shape, dtype=np.int8)
+        kind[occupied] = self.agents.type[content[occupied]]
+        alive[occupied] = self.agents.alive[content[occupied]]
+        self.kind[top:bottom] = kind
+        self.alive[top:bottom] = alive
+
+    def emigrate(self):
+        '''
+            Drops the ghosts, the eaten agents and the agents in the halo,
+            returns the last ones by destination tile, {index: values}.
+        '''
+        agents = self.agents
+        row = agents.x + self.origin
+        below = (row < self.low) & ~agents.removed
+        above = (row >= self.high) & ~agents.removed
+        emigrants = {}
+        for destination, leaving in ((self.index - 1, below),
+                                     (self.index + 1, above)):
+            if leaving.any():
+                emigrants[destination] = {
+                    name: getattr(agents, name)[leaving].copy()
+                    for name in agents.columns}
+                emigrants[destination]["x"] += self.origin
+
+        gone = below | above | agents.removed
+        if gone.any():
+            agents.drop(gone)
+        return emigrants
+
+    def grow(self):
+        floor = self.floor
+        floor.grow()
+        agents = self.agents
+        stats = {"floor": floor.take_sums(),
+                 "births": self.step_births, "deaths": self.step_deaths}
+        for kind in (NONINE, DEDDIAN):
+            members = agents.type == kind
+            stats[kind] = (int(np.count_nonzero(members)),
+                           float(agents.energy[members].sum()))
+        return stats
+
+    def gather(self):
+        agents = self.agents
+        values = {name: getattr(agents, name).copy() for name in agents.columns}
+        values["x"] += self.origin
+        return {"agents": values, "rng": self.rng.bit_generator.state}
+
+    def restore(self, state):
+        # The agents of the checkpoint arrive as immigrants of the round
+        self.floor.clock = state["clock"]
+        self.rng.bit_generator.state = state["rng"][self.index]
+
+    def close(self):
+        for memory in self.memory:
+            memory.close()
+
+
+def run_tile(connection, specification):
+    tile = Tile(specification)
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            connection.send(tile.run(*message))
+    finally:
+        tile.close()
+        connection.close()
+
+
+'''
+    TiledAgents: Coordinator of the tiles of a model (engine "tiled").
+
+    Parameters:
+        - model: Model (Cenitune) that owns the engine
+        - tiles: Number of stripes (worker processes), all the cores if None
+
+    Atributes:
+        - bounds: First row of each stripe (and the width at the end)
+        - kind, alive: Shared lattices of the type and alive state
+        - floor: Floor over the shared arrays (model.floor points to it)
+        - pending: Agents to send to each tile with the next round
+
+'''
+
+
+class TiledAgents:
+    def __init__(self, model, tiles=None):
+        self.model = model
+        self.width = model.width
+        self.height = model.height
+        if self.width < MINIMUM_ROWS:
+            raise ValueError("The tiled engine needs at least %d rows" %
+                             MINIMUM_ROWS)
+        tiles = tiles or multiprocessing.cpu_count()
+        tiles = max(1, min(tiles, self.width // MINIMUM_ROWS))
+
+        shape = (self.width, self.height)
+        cells = self.width * self.height
+        self.memory = [
+            shared_memory.SharedMemory(create=True, size=cells),
+            shared_memory.SharedMemory(create=True, size=cells),
+            shared_memory.SharedMemory(create=True, size=cells * 8),
+            shared_memory.SharedMemory(create=True, size=cells * 8)]
+        self.kind = shared_array(self.memory[0], shape, np.int8)
+        self.alive = shared_array(self.memory[1], shape, np.int8)
+        self.kind.fill(EMPTY)
+        self.alive.fill(0)
+        value = shared_array(self.memory[2], shape, np.float64)
+        stamp = shared_array(self.memory[3], shape, np.int64)
+        value[:] = model.floor.value
+        stamp[:] = model.floor.stamp
+        self.floor = Floor(self.width, self.height, cap=model.floor.cap,
+                           growth=model.floor.growth, value=value, stamp=stamp,
+                           clock=model.floor.clock)
+        model.floor = self.floor
+
+        self.bounds = np.linspace(0, self.width, tiles + 1).astype(int)
+        seeds = np.random.SeedSequence(
+            int(model.rng.integers(2 ** 63))).spawn(tiles)
+        self.connections = []
+        self.processes = []
+        for index in range(tiles):
+            low, high = int(self.bounds[index]), int(self.bounds[index + 1])
+            specification = {"index": index, "low": low,
+                             "middle": (low + high) // 2, "high": high,
+                             "width": self.width, "height": self.height,
+                             "memory": [memory.name for memory in self.memory],
+                             "cap": self.floor.cap,
+                             "growth": self.floor.growth,
+                             "clock": self.floor.clock,
+                             "agent_parameters": model.agent_parameters,
+                             "seed": seeds[index]}
+            connection, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_tile, args=(child, specification), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.pending = [None] * tiles
+        self.finalizer = weakref.finalize(self, shutdown, self.connections,
+                                          self.processes, self.memory)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.kind))
+
+    def round(self, command, argument=None):
+        for index, connection in enumerate(self.connections):
+            connection.send((command, argument, self.pending[index]))
+        self.pending = [None] * len(self.connections)
+
+        stats = []
+        for connection in self.connections:
+            emigrants, tile_stats = connection.recv()
+            for destination, values in emigrants.items():
+                self.pending[destination] = merge(self.pending[destination],
+                                                  values)
+            stats.append(tile_stats)
+        return stats
+
+    def fill(self, kind, number):
+        x, y = sample_cells(self.model.rng, self.kind == EMPTY, number)
+        self.kind[x, y] = kind
+        self.alive[x, y] = 1
+
+        Agent = Nonine if kind == NONINE else Deddian
+        parameters = dict(defaults(Agent), **self.model.agent_parameters[kind])
+        energy = np.full(number, parameters["initial_energy"], dtype=np.float64)
+        for index in range(len(self.connections)):
+            inside = ((x >= self.bounds[index]) &
+                      (x < self.bounds[index + 1]))
+            values = {"x": x[inside], "y": y[inside], "energy": energy[inside],
+                      "type": np.full(np.count_nonzero(inside), kind),
+                      "alive": np.ones(np.count_nonzero(inside)),
+                      "active": np.ones(np.count_nonzero(inside), dtype=bool)}
+            self.pending[index] = merge(self.pending[index], values)
+        self.model.population[kind] += number
+        self.model.total_energy[kind] += float(energy.sum())
+
+    def clean_deaths(self):
+        self.round("begin")
+
+    def activate(self):
+        # The newborns are activated by the tiles on begin
+        pass
+
+    def step(self):
+        for kind in (DEDDIAN, NONINE):
+            for half in (0, 1):
+                self.round("act", (kind, half))
+
+    def grow(self):
+        model = self.model
+        stats = self.round("grow")
+        self.floor.grow()
+        for tile in stats:
+            self.floor.add_sums(tile["floor"])
+        model.step_births = sum(tile["births"] for tile in stats)
+        model.step_deaths = sum(tile["deaths"] for tile in stats)
+        for kind in (NONINE, DEDDIAN):
+            model.population[kind] = sum(tile[kind][0] for tile in stats)
+            model.total_energy[kind] = sum(tile[kind][1] for tile in stats)
+
+        # Two tiles that wrote the same cell leave an agent off the lattice
+        population = sum(model.population.values())
+        if len(self) != population:
+            raise RuntimeError("The tiles are out of sync: %d agents on the "
+                               "lattice, population %d" % (len(self),
+                                                            population))
+
+    def gather(self):
+        '''
+            Agents of the tiles (values of their columns, rows of the world)
+            and states of the generators of the tiles.
+        '''
+        stats = self.round("gather")
+        values = None
+        for tile in stats:
+            values = merge(values, tile["agents"])
+        return values, [tile["rng"] for tile in stats]
+
+    def restore(self, floor, values, states):
+        '''
+            Sets the floor, the agents and the states of the generators of
+            the tiles of a checkpoint (see gather).
+        '''
+        self.floor.value[:] = floor.value
+        self.floor.stamp[:] = floor.stamp
+        self.floor = Floor(self.width, self.height, cap=floor.cap,
+                           growth=floor.growth, value=self.floor.value,
+                           stamp=self.floor.stamp, clock=floor.clock)
+        self.model.floor = self.floor
+
+        x, y = values["x"], values["y"]
+        self.kind[x, y] = values["type"]
+        self.alive[x, y] = values["alive"]
+        # The agents of the checkpoint replace the ones sent so far
+        for index in range(len(self.connections)):
+            inside = (x >= self.bounds[index]) & (x < self.bounds[index + 1])
+            self.pending[index] = {name: column[inside]
+                                   for name, column in values.items()}
+        self.round("restore", {"clock": floor.clock, "rng": states})
+
+    def cells(self):
+        '''
+            (x, y, kind) of the alive agents.
+        '''
+        x, y = np.nonzero((self.kind != EMPTY) & (self.alive == 1))
+        return x, y, self.kind[x, y]
+
+    def close(self):
+        '''
+            Stops the workers and frees the shared memory. The lattices and
+            the floor are copied first, so the model can still be read.
+        '''
+        if not self.finalizer.alive:
+            return
+        self.kind = self.kind.copy()
+        self.alive = self.alive.copy()
+        self.floor.value = self.floor.value.copy()
+        self.floor.stamp = self.floor.stamp.copy()
+        self.finalizer()
+
+
+def merge(values, more):
+    if values is None:
+        return more
+    return {name: np.concatenate((values[name], more[name]))
+            for name in values}
+
+
+def shutdown(connections, processes, memory):
+    for connection in connections:
+        try:
+            connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+    for block in memory:
+        block.close()
+        block.unlink()
@@ -0,0 +1,6 @@
+# Imports
+import os
+import sys
+
+# Shared modules of the repository (COMMON)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
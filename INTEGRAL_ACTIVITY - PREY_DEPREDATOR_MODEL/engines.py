@@ -0,0 +1,58 @@
+
+from System.Sweep import sweep
+import numpy as np
+import time
+import datetime
+
+STEPS = 60  # Steps of each run
+SEEDS = range(1000, 1060)  # Seeds of the runs of each engine
+REFERENCE = "object"  # Engine that the others are compared with
+# The tiled engine runs its own processes, it can not run in the pool
+ENGINES = ["array", "color"]
+STEPS_SHOWN = [20, 30, 40, 50, 59]
+LIMIT = 3  # Differences (in standard errors) shown as too large
+NAMES = ["Nonines", "Deddians"]
+
+
+def statistics(populations, step):
+    values = populations[:, step]
+    return values.mean(axis=0), values.std(axis=0, ddof=1) / np.sqrt(len(values))
+
+
+def progress(done, total):
+    print("\rRuns: %d / %d" % (done, total), end="", flush=True)
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    results = {}
+    for engine in [REFERENCE] + ENGINES:
+        print(engine)
+        results[engine] = sweep({}, SEEDS, STEPS, engine=engine,
+                                callback=progress)["populations"]
+        print()
+
+    # Mean of each population (± standard error) and the difference with
+    # the reference engine in standard errors
+    too_large = False
+    for step in STEPS_SHOWN:
+        reference, reference_error = statistics(results[REFERENCE], step)
+        print("Step", step)
+        for engine in [REFERENCE] + ENGINES:
+            mean, error = statistics(results[engine], step)
+            line = ["  %-8s" % engine]
+            for kind, name in enumerate(NAMES):
+                line.append("%s %7.1f ± %4.1f" % (name, mean[kind], error[kind]))
+                if engine != REFERENCE:
+                    gap = abs(mean[kind] - reference[kind]) / np.hypot(
+                        error[kind], reference_error[kind])
+                    line.append("(%.1f)%s" % (gap, " *" if gap > LIMIT else ""))
+                    too_large |= bool(gap > LIMIT)
+            print(" ".join(line))
+
+    print("Time executation: ", str(
+        datetime.timedelta(seconds=(time.time() - start_time))))
+    if too_large:
+        print("Differences larger than %d standard errors (*)" % LIMIT)
+    else:
+        print("Every engine matches", REFERENCE)
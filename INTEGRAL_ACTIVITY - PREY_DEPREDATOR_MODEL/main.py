@@ -1,37 +1,73 @@
 
-from System.Model import Cenitune
+from System.Model import Cenitune, get_population, is_full
+from System.Model import get_state, load_checkpoint
+from COMMON.Animation import GifSink
+from COMMON.FrameStore import FrameStore
+from COMMON.StopConditions import StopConditions, Extinction, Predicate
+from COMMON.StopConditions import SteadyState, Cycle, WallClock
+from COMMON.Profiler import Profiler
+from COMMON.Checkpoint import CheckpointWriter
 import time
 import datetime
-import matplotlib.animation as animation
-import matplotlib.pyplot as plt
 
 MAX_ITERATIONS = 200
+ENGINE = "object"  # "object" (Mesa), "array", "color" (NumPy) or "tiled" (processes)
+PALETTE = {0: (255, 255, 255), 3: (102, 102, 102), 5: (0, 0, 0)}  # Cell colors
+TIME_BUDGET = 600  # Time of execution maximum in seconds
+PROFILE = False  # Save the time of each phase (profile.json, profile.folded)
+CHECKPOINT = "checkpoint.npz"  # Checkpoint of the simulation (latest)
+CHECKPOINT_EVERY = 0  # Steps between two checkpoints (0 disabled)
+RESUME = False  # Resume the simulation from CHECKPOINT
+FRAMES = None  # .npy with the grids (FrameStore) instead of the GIF, if set
+FRAMES_STRIDE = 1  # Steps between two grids of FRAMES
 
 start_time = time.time()
-Model = Cenitune()
+if FRAMES is None:
+    animation = GifSink(' Simulation of the Prey - Depredator Model.gif',
+                        PALETTE, fps=10, scale=6)
+else:
+    # The shape of the grids is taken from the first one (model or checkpoint)
+    animation = FrameStore(MAX_ITERATIONS + 1, path=FRAMES,
+                           stride=FRAMES_STRIDE)
+stop_conditions = StopConditions(
+    Extinction(get_population, ("Nonines", "Deddians")),
+    Predicate(is_full, "full grid"),
+    SteadyState(get_population, window=50),
+    Cycle(get_population, window=200),
+    WallClock(TIME_BUDGET))
+profiler = Profiler(memory=True) if PROFILE else None
+if RESUME:
+    Model = load_checkpoint(CHECKPOINT, recorder=animation,
+                            stop_conditions=stop_conditions, profiler=profiler)
+else:
+    Model = Cenitune(engine=ENGINE, recorder=animation,
+                     stop_conditions=stop_conditions, profiler=profiler)
+checkpoints = None
+if CHECKPOINT_EVERY > 0:
+    checkpoints = CheckpointWriter(CHECKPOINT, CHECKPOINT_EVERY, get_state)
 
-i = 0
-while i <= MAX_ITERATIONS:
+i = Model.current_step
+while i <= MAX_ITERATIONS and Model.running:
     Model.step()
     i += 1
+    if checkpoints is not None:
+        checkpoints.step(Model, i)
+animation.close()
+if checkpoints is not None:
+    checkpoints.close()
+
+print("Steps: ", i, "- Stopped by: ", Model.stop_reason or "max iterations")
 
 print("Time executation: ", str(
     datetime.timedelta(seconds=(time.time() - start_time))))
 
-all_grids = Model.datacollector.get_model_vars_dataframe()
-
-fig, axis = plt.subplots(figsize=(7, 7))
-axis.set_xticks([])
-axis.set_yticks([])
-patch = axis.imshow(all_grids.iloc[0][0], cmap=plt.cm.binary)
-
-
-def animate(i):
-    patch.set_data(all_grids.iloc[i][0])
-
+if FRAMES is None:
+    print("Simulation of the Prey - Depredator Model.gif ready")
+else:
+    print(FRAMES, "ready")
 
-anim = animation.FuncAnimation(
-    fig, animate, frames=len(all_grids), interval=100)
-anim.save(' Simulation of the Prey - Depredator Model.gif',
-          writer='imagemagick', fps=10)
-print("Simulation of the Prey - Depredator Model.gif ready")
+if profiler is not None:
+    profiler.restore()
+    profiler.to_json("profile.json")
+    profiler.to_collapsed("profile.folded")
+    print("Profile saved in profile.json and profile.folded")
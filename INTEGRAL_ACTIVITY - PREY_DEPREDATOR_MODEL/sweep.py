@@ -0,0 +1,31 @@
+
+from System.Sweep import sweep
+from COMMON.Cache import ResultCache
+import time
+import datetime
+
+STEPS = 200  # Steps of each run
+SEEDS = range(10)  # Seeds of the runs of each combination
+RESULTS = "Sweep of the Prey - Depredator Model.npz"
+CACHE = ".cache"  # Directory of the results of previous runs
+GRID = {
+    "initial_nonines": [30, 47, 60],
+    "initial_deddians": [10, 15],
+    "initial_herb": [20],
+    "nonine.energy_rate": [2, 3],
+    "deddian.probability_reproduce": [0.3, 0.5],
+}
+
+
+def progress(done, total):
+    print("\rRuns: %d / %d" % (done, total), end="", flush=True)
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    result = sweep(GRID, SEEDS, STEPS, RESULTS, callback=progress,
+                   cache=ResultCache(CACHE))
+    print()
+    print("Time executation: ", str(
+        datetime.timedelta(seconds=(time.time() - start_time))))
+    print(RESULTS, "ready")
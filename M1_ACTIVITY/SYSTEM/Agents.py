@@ -12,6 +12,11 @@
 from mesa import Agent
 import numpy as np
 
+# Moore neighbourhood, the moves of the robots
+OPTIONS = np.array([[-1, -1], [-1,  0], [-1, +1],
+                    [0, -1],           [0, +1],
+                    [+1, -1], [+1,  0], [+1, +1]])
+
 '''
     Agent RobotVacuumCleanerAgent
 
@@ -32,25 +37,23 @@ class RobotVacuumCleanerAgent(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         self.moviments = 0
-        self.options = np.array([[-1, -1], [-1,  0], [-1, +1],
-                                 [0, -1],           [0, +1],
-                                 [+1, -1], [+1,  0], [+1, +1]])
+        self.options = OPTIONS
 
     def random_position(self):
-        option = self.random.choice(self.options)
-
-        new_position = (self.pos[0] + option[0], self.pos[1] + option[1])
-
-        if self.model.grid.out_of_bounds(new_position):
-            return None
+        # Same draw as random.choice(self.options), None outside the grid
+        option = self.random.randrange(len(self.options))
 
-        return new_position
+        return self.model.neighbourhood.neighbour(self.pos, option)
 
     def step(self):
         if self.model.floor[self.pos[0]][self.pos[1]] == 1:
-            self.model.floor[self.pos[0]][self.pos[1]] = 0
+            self.model.clean(self.pos[0], self.pos[1])
         else:
-            new_position = self.random_position()
+            if self.model.strategy is None:
+                new_position = self.random_position()
+            else:
+                new_position = self.model.strategy.move(self.unique_id,
+                                                        self.pos)
 
             if new_position is None:
                 return
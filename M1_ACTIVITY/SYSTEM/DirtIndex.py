@@ -0,0 +1,70 @@
+'''
+
+    TC2008B - M1 - Activity 1
+
+    Index of the dirty cells of the floor.
+
+    Keeps the number of dirty cells of the floor and of each tile (square
+    of tile x tile cells), updated on every clean, so the completion checks
+    and the percentage of dirty cells are O(1) and the search of dirt can
+    skip the clean tiles.
+
+'''
+
+# Imports
+import numpy as np
+
+'''
+    DirtIndex
+
+    Parameters:
+        - floor: Floor of the model (1 dirty, 0 clean), cleaned through clean
+        - tile: Side of the tiles in cells
+
+    Attributes:
+        - count: Number of dirty cells
+        - tiles: Number of dirty cells of each tile
+
+'''
+
+
+class DirtIndex:
+    def __init__(self, floor, tile=16):
+        if tile < 1:
+            raise ValueError("tile must be at least 1")
+
+        self.floor = floor
+        self.tile = tile
+        self.cells = floor.size
+        width, height = floor.shape
+        dirty = np.zeros((-(-width // tile) * tile, -(-height // tile) * tile),
+                         dtype=np.int64)
+        dirty[:width, :height] = floor != 0
+        self.tiles = dirty.reshape(dirty.shape[0] // tile, tile,
+                                   dirty.shape[1] // tile, tile).sum(axis=(1, 3))
+        self.count = int(self.tiles.sum())
+
+    def clean(self, x, y):
+        '''
+            Cleans the cells (x, y), numbers or arrays of distinct dirty
+            cells.
+        '''
+        self.floor[x, y] = 0
+        if np.ndim(x) == 0:
+            self.count -= 1
+            self.tiles[x // self.tile, y // self.tile] -= 1
+            return
+        self.count -= len(x)
+        np.subtract.at(self.tiles, (x // self.tile, y // self.tile), 1)
+
+    def is_clean(self):
+        return self.count == 0
+
+    def percentage(self):
+        return self.count / self.cells
+
+    def dirty_tiles(self):
+        '''
+            Index (tx, ty) of the tiles with dirt, (M, 2).
+        '''
+        return np.argwhere(self.tiles > 0)
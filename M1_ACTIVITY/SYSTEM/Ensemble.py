@@ -0,0 +1,146 @@
+'''
+
+    TC2008B - M1 - Activity 1
+
+    Ensemble of independent robot vacuum cleaner worlds.
+
+    Runs N replicas of the vectorized RobotVacuumCleanerModel (random walk)
+    at once: the floors are one (N, W, H) array and the robots one
+    (N, R, 2) array, so a step of every replica is a few NumPy operations
+    instead of N models stepped from Python. The replicas that finished
+    (clean floor or max steps) are left out of the next steps.
+
+    Scope: the robots only follow the random walk. The strategies of the
+    model ("nearest", "sweep") keep a state per world (distance field,
+    regions of each robot) and run one world at a time with
+    RobotVacuumCleanerModel(vectorized=True, strategy=...). The ensemble is
+    its own class and not a mode of RobotVacuumCleanerModel, whose worlds
+    are Mesa models (grid, schedule, datacollector).
+
+'''
+
+# Imports
+from SYSTEM.Agents import OPTIONS
+from COMMON.Placement import sample_cells
+import numpy as np
+
+'''
+    RobotVacuumEnsemble
+
+    Parameters:
+        - replicas: Number of independent worlds
+        - width: Width of the grid
+        - height: Height of the grid
+        - num_agents: Number of robots of each world
+        - dirty_cells_percentage: Percentage of dirty cells in the grid
+        - flag: If True a world only finishes when its floor is clean
+        - max_steps: Maximum number of steps of each world
+        - seed: Seed of the ensemble (random if None)
+
+    Attributes:
+        - rng: NumPy generator of the ensemble
+        - floors: Floor of each world, (N, W, H) (1 dirty, 0 clean)
+        - positions: Position of each robot, (N, R, 2)
+        - moviments: Number of moviments of each robot, (N, R)
+        - dirty: Number of dirty cells of each world, (N,)
+        - steps: Number of steps of each world, (N,)
+        - completed_step: Step when the floor of each world was clean, (N,)
+          (-1 before)
+        - running: Worlds that are still stepped, (N,)
+
+'''
+
+
+class RobotVacuumEnsemble:
+    def __init__(self, replicas, width, height, num_agents,
+                 dirty_cells_percentage=0.5, flag=False, max_steps=200,
+                 seed=None):
+        if replicas < 1:
+            raise ValueError("replicas must be at least 1")
+
+        self.replicas = replicas
+        self.width = width
+        self.height = height
+        self.num_agents = num_agents
+        self.dirty_cells_percentage = dirty_cells_percentage
+        self.flag = flag
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+
+        self.floors = np.zeros((replicas, width, height), dtype=np.int8)
+        amount = int((width * height) * dirty_cells_percentage)
+        free = np.ones((width, height), dtype=bool)
+        for floor in self.floors:
+            x, y = sample_cells(self.rng, free, amount)
+            floor[x, y] = 1
+        self.positions = np.ones((replicas, num_agents, 2), dtype=np.int64)
+        self.moviments = np.zeros((replicas, num_agents), dtype=np.int64)
+        self.dirty = np.full(replicas, amount, dtype=np.int64)
+        self.steps = np.zeros(replicas, dtype=np.int64)
+        self.completed_step = np.where(self.dirty == 0, 0, -1)
+        self.running = (self.dirty > 0) & (flag or max_steps > 0)
+
+    def step(self):
+        '''
+            Steps every running world with the rules of step_robots of the
+            model: in each world, the first robot of a random order on a
+            dirty cell cleans it, the others try a random move and stay if
+            it leaves the grid.
+        '''
+        worlds = np.flatnonzero(self.running)
+        if len(worlds) == 0:
+            return
+
+        # A random order of the robots of each world
+        robots = self.rng.random((len(worlds), self.num_agents)).argsort(
+            axis=1).ravel()
+        world = np.repeat(worlds, self.num_agents)
+        x = self.positions[world, robots, 0]
+        y = self.positions[world, robots, 1]
+        _, first = np.unique((world * self.width + x) * self.height + y,
+                             return_index=True)
+        cleaning = np.zeros(len(robots), dtype=bool)
+        cleaning[first] = self.floors[world[first], x[first], y[first]] == 1
+        self.floors[world[cleaning], x[cleaning], y[cleaning]] = 0
+        self.dirty -= np.bincount(world[cleaning], minlength=self.replicas)
+
+        movers = ~cleaning
+        new_positions = np.stack((x[movers], y[movers]), axis=1) + OPTIONS[
+            self.rng.integers(0, len(OPTIONS), np.count_nonzero(movers))]
+        moving = ((new_positions >= 0) &
+                  (new_positions < (self.width, self.height))).all(axis=1)
+        world, robots = world[movers][moving], robots[movers][moving]
+        self.positions[world, robots] = new_positions[moving]
+        self.moviments[world, robots] += 1
+
+        self.steps[worlds] += 1
+        clean = worlds[self.dirty[worlds] == 0]
+        self.completed_step[clean] = self.steps[clean]
+        self.running[worlds] = self.dirty[worlds] > 0
+        if not self.flag:
+            self.running &= self.steps < self.max_steps
+
+    def run(self):
+        '''
+            Steps the worlds until all of them finish, returns the step
+            when each floor was clean (-1 if not) and the moviments of the
+            robots of each world.
+        '''
+        while self.running.any():
+            self.step()
+        return self.completed_step, self.moviments.sum(axis=1)
+
+    def get_info(self):
+        completed = self.completed_step[self.completed_step >= 0]
+        print("Number of replicas: ", self.replicas)
+        print("Number of agents: ", self.num_agents)
+        print("Dirty cells percentage: ", round(
+            self.dirty_cells_percentage, 2))
+        print("Grid size: ", self.width, "x", self.height)
+        print("Completed replicas: ", len(completed), "/", self.replicas)
+        if len(completed) > 0:
+            print("Average steps to completion: ",
+                  round(completed.mean(), 2), "- Std: ",
+                  round(completed.std(), 2))
+        print("Average moviments per replica: ",
+              round(self.moviments.sum(axis=1).mean(), 2))
@@ -9,25 +9,35 @@
         2022-11-22
 
 '''
-from SYSTEM.Agents import RobotVacuumCleanerAgent
+from SYSTEM.Agents import RobotVacuumCleanerAgent, OPTIONS
+from SYSTEM.DirtIndex import DirtIndex
+from SYSTEM.Strategies import STRATEGIES
 from mesa import Model
 from mesa.space import MultiGrid
 from mesa.time import RandomActivation
 from mesa.datacollection import DataCollector
+from COMMON.Recorder import FrameRecorder, NullRecorder
+from COMMON import Checkpoint
+from COMMON.Placement import sample_cells
+from COMMON.Raster import Rasterizer, positions
+from COMMON.Neighbourhood import neighbourhood_table
 import numpy as np
 
-LIMIT = 10000
 
+# Frame of the model: 2 dirty cell, 1 robot, 0 clean cell
+RASTERIZER = Rasterizer()
 
-def get_grid(model):
-    grid = np.zeros((model.grid.width, model.grid.height))
-    for x in range(model.grid.width):
-        for y in range(model.grid.height):
-            if model.grid.is_cell_empty((x, y)):
-                grid[x][y] = model.floor[x][y] * 2
-            else:
-                grid[x][y] = 1
-    return grid
+
+def get_grid(model, out=None):
+    if out is None:
+        grid = np.zeros((model.grid.width, model.grid.height))
+    else:
+        grid = out
+    if model.vectorized:
+        x, y = model.positions[:, 0], model.positions[:, 1]
+    else:
+        x, y = positions(model.schedule.agents)
+    return RASTERIZER.draw(grid, x, y, 1, model.floor * 2)
 
 
 '''
@@ -40,19 +50,49 @@ def get_grid(model):
         - height: Height of the grid
         - num_agents: Number of robots that will be in the grid
         - dirty_cells_percentage: Percentage of dirty cells in the grid
+        - flag: If True the model only finishes when the floor is clean
+        - max_steps: Maximum number of steps of the model
+        - recorder: Recorder of the grids (FrameRecorder by default)
+        - seed: Seed of the model, drives all its randomness (random if None)
+        - stop_conditions: StopConditions checked after each step
+        - vectorized: Keep the robots in arrays and step all of them with
+          NumPy operations (see step_robots) instead of Mesa agents
+        - tile: Side of the tiles of the index of the dirty cells
+        - strategy: Navigation of the robots, "random" (random walk),
+          "nearest" (nearest dirty cell) or "sweep" (own regions), see
+          SYSTEM/Strategies.py
 
     Attributes:
         - grid: Grid of the model
         - schedule: Schedule of the model
         - datacollector: Datacollector of the model
+        - recorder: Recorder of the grid of each step
+        - frame: Buffer (uint8) where the grid of each step is drawn
         - floor: Floor of the model
+        - neighbourhood: Table of the moves of the robots from each cell
+          (OPTIONS, without leaving the grid)
+        - dirt: Index of the dirty cells of the floor (DirtIndex), the
+          floor is cleaned through it
+        - rng: NumPy generator of the model (seeded from self.random)
+        - running: False once a stop condition is met
+        - stop_reason: Reason of the end of the simulation (None while running)
+        - positions: Position of each robot, (N, 2) (vectorized only)
+        - moviments: Number of moviments of each robot (vectorized only)
+        - strategy: Strategy of the robots (None for the random walk)
+        - initial_dirty: Number of dirty cells at the start
+        - completed_step: Step when the floor was clean (None before)
 
 
 '''
 
 
 class RobotVacuumCleanerModel(Model):
-    def __init__(self, width, height, num_agents, dirty_cells_percentage=0.5, flag=False, max_steps=200):
+    def __init__(self, width, height, num_agents, dirty_cells_percentage=0.5, flag=False, max_steps=200, recorder=None,
+                 seed=None, stop_conditions=None, vectorized=False, tile=16,
+                 strategy="random"):
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown strategy: %s" % strategy)
+
         self.num_agents = num_agents
         self.dirty_cells_percentage = dirty_cells_percentage
         self.grid = MultiGrid(width, height, True)
@@ -61,47 +101,230 @@ class RobotVacuumCleanerModel(Model):
         self.max_steps = max_steps
         self.flag = flag
         self.current_step = 0
+        self.stop_conditions = stop_conditions
+        self.running = True
+        self.stop_reason = None
+        self.rng = np.random.default_rng(self.random.getrandbits(64))
+        self.neighbourhood = neighbourhood_table(width, height, offsets=OPTIONS)
+        self.vectorized = vectorized
 
-        for i in range(self.num_agents):
-            a = RobotVacuumCleanerAgent(i, self)
-            self.grid.place_agent(a, (1, 1))
-            self.schedule.add(a)
+        if self.vectorized:
+            self.positions = np.ones((self.num_agents, 2), dtype=np.int64)
+            self.moviments = np.zeros(self.num_agents, dtype=np.int64)
+        else:
+            for i in range(self.num_agents):
+                a = RobotVacuumCleanerAgent(i, self)
+                self.grid.place_agent(a, (1, 1))
+                self.schedule.add(a)
 
         amount = int((width * height) * dirty_cells_percentage)
-        for i in range(amount):
-            finished = False
-            while not finished:
-                x = int(np.random.rand() * LIMIT) % width
-                y = int(np.random.rand() * LIMIT) % height
-                if self.floor[x][y] == 0:
-                    self.floor[x][y] = 1
-                    finished = True
+        x, y = sample_cells(self.rng, self.floor == 0, amount)
+        self.floor[x, y] = 1
+        self.dirt = DirtIndex(self.floor, tile)
+        self.initial_dirty = self.dirt.count
+        self.completed_step = None
+        self.strategy = None
+        if STRATEGIES[strategy] is not None:
+            self.strategy = STRATEGIES[strategy](self)
 
-        self.datacollector = DataCollector(model_reporters={"Grid": get_grid})
+        self.datacollector = DataCollector()
+        self.recorder = FrameRecorder() if recorder is None else recorder
+        self.frame = np.zeros((width, height), dtype=np.uint8)
 
     def is_finalized(self):
-        is_clean = np.all(self.floor == 0)
+        is_clean = self.dirt.is_clean()
 
-        if self.flag:
-            return is_clean
+        if is_clean:
+            self.stop_reason = "clean floor"
+        elif not self.flag and self.current_step >= self.max_steps:
+            self.stop_reason = "max steps"
 
-        return self.current_step >= self.max_steps or is_clean
+        self.running = self.stop_reason is None
+        return not self.running
 
     def get_info(self):
         print("Number of model steps: ", self.current_step)
+        print("Stopped by: ", self.stop_reason)
         print("Number of agents: ", self.num_agents)
         print("Dirty cells percentage: ", round(
             self.dirty_cells_percentage, 2))
+        print("Dirty cells: ", self.dirt.count, "- Dirty tiles: ",
+              len(self.dirt.dirty_tiles()), "/", self.dirt.tiles.size)
         print("Grid size: ", self.grid.width, "x", self.grid.height)
+        print("Strategy: ", "random" if self.strategy is None
+              else self.strategy.name)
+        print("Steps to completion: ", self.completed_step or "not completed")
         acum = 0
-        for agent in self.schedule.agents:
-            print("Agent", agent.unique_id, "moviments: ", agent.moviments)
-            acum += agent.moviments
+        if self.vectorized:
+            robots = enumerate(self.moviments.tolist())
+        else:
+            robots = ((agent.unique_id, agent.moviments)
+                      for agent in self.schedule.agents)
+        for unique_id, moviments in robots:
+            print("Agent", unique_id, "moviments: ", moviments)
+            acum += moviments
         print("Average moviments: ", round(acum / self.num_agents, 2))
+        cleaned = self.initial_dirty - self.dirt.count
+        if cleaned > 0:
+            print("Moviments per cleaned cell: ", round(acum / cleaned, 2))
+
+    def clean(self, x, y):
+        self.dirt.clean(x, y)
+        if self.strategy is not None:
+            self.strategy.cleaned(x, y)
+
+    def step_robots(self):
+        '''
+            Steps every robot at once, with the same rules as the agents in
+            a random order: the first robot of the order on a dirty cell
+            cleans it, the other robots (of that cell and of the clean
+            cells) try a random move and stay if it leaves the grid.
+        '''
+        order = self.rng.permutation(self.num_agents)
+        x, y = self.positions[order, 0], self.positions[order, 1]
+        _, first = np.unique(x * self.grid.height + y, return_index=True)
+        cleaning = np.zeros(self.num_agents, dtype=bool)
+        cleaning[first] = self.floor[x[first], y[first]] == 1
+        self.clean(x[cleaning], y[cleaning])
+
+        movers = order[~cleaning]
+        if self.strategy is None:
+            new_positions = self.positions[movers] + OPTIONS[
+                self.rng.integers(0, len(OPTIONS), len(movers))]
+        else:
+            new_positions = self.strategy.moves(movers, self.positions[movers])
+        moving = ((new_positions >= 0) &
+                  (new_positions < (self.grid.width, self.grid.height))).all(axis=1)
+        moving &= (new_positions != self.positions[movers]).any(axis=1)
+        self.positions[movers[moving]] = new_positions[moving]
+        self.moviments[movers[moving]] += 1
 
     def step(self):
         self.datacollector.collect(self)
-        self.schedule.step()
-        self.dirty_cells_percentage = np.count_nonzero(
-            self.floor) / (self.grid.width * self.grid.height)
+        self.recorder.record(get_grid(self, self.frame))
+        if self.vectorized:
+            self.step_robots()
+            self.schedule.steps += 1
+            self.schedule.time += 1
+        else:
+            self.schedule.step()
+        self.dirty_cells_percentage = self.dirt.percentage()
         self.current_step += 1
+        if self.completed_step is None and self.dirt.is_clean():
+            self.completed_step = self.current_step
+
+        if self.stop_conditions is not None:
+            self.stop_reason = self.stop_conditions.check(self)
+            self.running = self.stop_reason is None
+
+
+def get_state(model):
+    '''
+        State of the model as (arrays, metadata), see COMMON/Checkpoint.py.
+        The recorder and the stop conditions are not part of the state.
+    '''
+    random_internal, random_metadata = Checkpoint.random_state(model.random)
+    series, series_names = Checkpoint.series_state(model.datacollector)
+    arrays = dict(series, floor=model.floor.copy(), random=random_internal)
+    if model.vectorized:
+        arrays.update(robots_id=np.arange(model.num_agents, dtype=np.int64),
+                      robots_x=model.positions[:, 0].copy(),
+                      robots_y=model.positions[:, 1].copy(),
+                      robots_moviments=model.moviments.copy())
+    else:
+        robots = model.schedule.agents
+        arrays.update(
+            robots_id=np.array([robot.unique_id for robot in robots],
+                               dtype=np.int64),
+            robots_x=np.array([robot.pos[0] for robot in robots],
+                              dtype=np.int64),
+            robots_y=np.array([robot.pos[1] for robot in robots],
+                              dtype=np.int64),
+            robots_moviments=np.array([robot.moviments for robot in robots],
+                                      dtype=np.int64))
+    metadata = {
+        "arguments": {"width": model.grid.width, "height": model.grid.height,
+                      "num_agents": model.num_agents,
+                      "flag": model.flag, "max_steps": model.max_steps,
+                      "vectorized": model.vectorized,
+                      "tile": model.dirt.tile,
+                      "strategy": "random" if model.strategy is None
+                      else model.strategy.name},
+        "seed": model._seed,
+        "random": random_metadata,
+        "rng": Checkpoint.generator_state(model.rng),
+        "series": series_names,
+        "dirty_cells_percentage": model.dirty_cells_percentage,
+        "current_step": model.current_step,
+        "initial_dirty": model.initial_dirty,
+        "completed_step": model.completed_step,
+        "steps": model.schedule.steps,
+        "running": model.running,
+        "stop_reason": model.stop_reason,
+    }
+    return arrays, metadata
+
+
+def from_state(arrays, metadata, recorder=None, stop_conditions=None):
+    arguments = dict(metadata["arguments"], num_agents=0,
+                     dirty_cells_percentage=0)
+    model = RobotVacuumCleanerModel(recorder=recorder, seed=metadata["seed"],
+                                    stop_conditions=stop_conditions,
+                                    **arguments)
+    model.num_agents = metadata["arguments"]["num_agents"]
+    model.dirty_cells_percentage = metadata["dirty_cells_percentage"]
+    model.floor = arrays["floor"].copy()
+    model.dirt = DirtIndex(model.floor, model.dirt.tile)
+    model.initial_dirty = metadata.get("initial_dirty", model.dirt.count)
+    model.completed_step = metadata.get("completed_step")
+    if model.strategy is not None:
+        model.strategy = type(model.strategy)(model)
+
+    if model.vectorized:
+        model.positions = np.stack((arrays["robots_x"], arrays["robots_y"]),
+                                   axis=1)
+        model.moviments = arrays["robots_moviments"].copy()
+    else:
+        for index in range(len(arrays["robots_id"])):
+            robot = RobotVacuumCleanerAgent(int(arrays["robots_id"][index]),
+                                            model)
+            robot.moviments = int(arrays["robots_moviments"][index])
+            model.grid.place_agent(robot, (int(arrays["robots_x"][index]),
+                                           int(arrays["robots_y"][index])))
+            model.schedule.add(robot)
+
+    model.current_step = metadata["current_step"]
+    model.schedule.steps = model.schedule.time = metadata["steps"]
+    model.running = metadata["running"]
+    model.stop_reason = metadata["stop_reason"]
+    Checkpoint.set_series_state(model.datacollector, arrays,
+                                metadata["series"])
+    Checkpoint.set_random_state(model.random, arrays["random"],
+                                metadata["random"])
+    Checkpoint.set_generator_state(model.rng, metadata["rng"])
+    return model
+
+
+def steps_to_clean(seed=None, max_steps=100000, vectorized=True, **arguments):
+    '''
+        Runs a model (RobotVacuumCleanerModel arguments) without recording
+        until its floor is clean, returns the number of steps (max_steps if
+        the floor is still dirty then). A replica of COMMON/Experiment.py.
+    '''
+    model = RobotVacuumCleanerModel(max_steps=max_steps, seed=seed,
+                                    vectorized=vectorized,
+                                    recorder=NullRecorder(), **arguments)
+    while not model.is_finalized():
+        model.step()
+    if model.completed_step is None:
+        return model.current_step
+    return model.completed_step
+
+
+def save_checkpoint(model, path, compress=False):
+    Checkpoint.save(path, *get_state(model), compress=compress)
+
+
+def load_checkpoint(path, recorder=None, stop_conditions=None):
+    arrays, metadata = Checkpoint.load(path)
+    return from_state(arrays, metadata, recorder, stop_conditions)
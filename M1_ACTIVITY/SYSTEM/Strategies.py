@@ -0,0 +1,273 @@
+'''
+
+    TC2008B - M1 - Activity 1
+
+    Navigation strategies of the robots.
+
+    A strategy gives the next position of the robots that do not clean in
+    the step (the random walk of RobotVacuumCleanerAgent is the default,
+    strategy None in the model):
+        - NearestDirt: Each robot moves to the neighbour closest to a dirty
+          cell, following a distance field shared by all the robots
+          (DistanceField), updated on every clean.
+        - Sweep: The floor is split in regions, each robot gets its own
+          regions and sweeps them row by row (boustrophedon), going to the
+          next dirty cell of its path.
+
+    A strategy has moves(robots, positions) -> new positions (K, 2) for
+    arrays of robots and cleaned(x, y), called after each clean. The new
+    position can be outside the grid (the robot stays) or the same one.
+
+'''
+
+# Imports
+from SYSTEM.Agents import OPTIONS
+import math
+import numpy as np
+
+# Distance of the cells that can not reach any dirty cell
+INF = np.iinfo(np.int64).max // 2
+
+
+'''
+    DistanceField
+
+    Distance (number of moves of a robot, Moore neighbourhood) from each
+    cell to the nearest dirty cell, as a breadth-first search from all the
+    dirty cells. When cells are cleaned only the cells whose distance came
+    from them are searched again.
+
+    Parameters:
+        - floor: Floor of the model (1 dirty, 0 clean)
+
+    Attributes:
+        - distance: Distance of each cell, flat with a border of one cell
+          (INF if there is no dirt)
+
+'''
+
+
+class DistanceField:
+    def __init__(self, floor):
+        width, height = floor.shape
+        self.height = height + 2
+        self.offsets = OPTIONS[:, 0] * self.height + OPTIONS[:, 1]
+        inside = np.zeros((width + 2, height + 2), dtype=bool)
+        inside[1:-1, 1:-1] = True
+        self.inside = inside.ravel()
+        self.affected = np.zeros(self.inside.shape, dtype=bool)
+        self.slot = np.zeros(self.inside.shape, dtype=np.int64)
+        self.distance = np.full(self.inside.shape, INF, dtype=np.int64)
+
+        x, y = np.nonzero(floor)
+        sources = self.index(x, y)
+        self.distance[sources] = 0
+        self.propagate(sources, np.zeros(len(sources), dtype=np.int64))
+
+    def index(self, x, y):
+        return (np.asarray(x) + 1) * self.height + np.asarray(y) + 1
+
+    def neighbours(self, cells):
+        neighbours = (cells[:, None] + self.offsets).ravel()
+        return neighbours[self.inside[neighbours]]
+
+    def distinct(self, cells):
+        '''
+            Cells without repetitions (linear, faster than np.unique).
+        '''
+        positions = np.arange(len(cells))
+        self.slot[cells] = positions
+        return cells[self.slot[cells] == positions]
+
+    def propagate(self, cells, values):
+        '''
+            Breadth-first search from cells, each one entering the search
+            at the level of its distance (values).
+        '''
+        order = np.argsort(values, kind="stable")
+        cells, values = cells[order], values[order]
+        start = 0
+        level = 0
+        frontier = cells[:0]
+        while start < len(cells) or len(frontier) > 0:
+            if len(frontier) == 0:
+                level = values[start]
+            stop = np.searchsorted(values, level, side="right")
+            entering = cells[start:stop]
+            start = stop
+            frontier = np.concatenate(
+                (frontier, entering[self.distance[entering] == level]))
+            if len(frontier) == 0:
+                continue
+
+            neighbours = self.neighbours(frontier)
+            neighbours = self.distinct(
+                neighbours[self.distance[neighbours] > level + 1])
+            self.distance[neighbours] = level + 1
+            frontier = neighbours
+            level += 1
+
+    def remove(self, x, y):
+        '''
+            The cells (x, y) are not dirty anymore.
+        '''
+        cells = np.atleast_1d(self.index(x, y))
+        if len(cells) == 0:
+            return
+
+        # Cells whose distance came only from the removed cells
+        self.affected[cells] = True
+        layers = [cells]
+        frontier = cells
+        level = 0
+        while len(frontier) > 0:
+            neighbours = self.distinct(self.neighbours(frontier))
+            neighbours = neighbours[~self.affected[neighbours] &
+                                    (self.distance[neighbours] == level + 1)]
+            support = neighbours[:, None] + self.offsets
+            supported = ((self.distance[support] == level) &
+                         ~self.affected[support] &
+                         self.inside[support]).any(axis=1)
+            frontier = neighbours[~supported]
+            self.affected[frontier] = True
+            layers.append(frontier)
+            level += 1
+
+        # Search them again from the cells around them
+        affected = np.concatenate(layers)
+        self.distance[affected] = INF
+        around = affected[:, None] + self.offsets
+        distances = np.where(self.inside[around] & ~self.affected[around],
+                             self.distance[around], INF)
+        values = distances.min(axis=1)
+        self.affected[affected] = False
+        seeds = values < INF
+        self.distance[affected[seeds]] = values[seeds] + 1
+        self.propagate(affected[seeds], values[seeds] + 1)
+
+
+'''
+    Strategy
+
+    Parameters:
+        - model: Model of the robots
+
+'''
+
+
+class Strategy:
+    name = None
+
+    def __init__(self, model):
+        self.model = model
+
+    def random_moves(self, positions):
+        return positions + OPTIONS[self.model.rng.integers(
+            0, len(OPTIONS), len(positions))]
+
+    def cleaned(self, x, y):
+        pass
+
+    def moves(self, robots, positions):
+        return self.random_moves(positions)
+
+    def move(self, robot, position):
+        '''
+            Next position of one robot, None if it does not move.
+        '''
+        new_position = self.moves(np.array([robot]), np.array([position]))[0]
+        if (self.model.grid.out_of_bounds(tuple(new_position)) or
+                tuple(new_position) == tuple(position)):
+            return None
+        return int(new_position[0]), int(new_position[1])
+
+
+class NearestDirt(Strategy):
+    name = "nearest"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.field = DistanceField(model.floor)
+
+    def cleaned(self, x, y):
+        self.field.remove(x, y)
+
+    def moves(self, robots, positions):
+        neighbours = positions[:, None, :] + OPTIONS
+        x, y = neighbours[..., 0], neighbours[..., 1]
+        distances = self.field.distance[self.field.index(x, y)].astype(
+            np.float64)
+        # Random choice between the neighbours at the same distance
+        keys = distances + self.model.rng.random(distances.shape) * 0.5
+        choice = keys.argmin(axis=1)
+        rows = np.arange(len(positions))
+        new_positions = neighbours[rows, choice]
+
+        lost = distances[rows, choice] >= INF
+        new_positions[lost] = self.random_moves(positions[lost])
+        return new_positions
+
+
+class Sweep(Strategy):
+    name = "sweep"
+
+    def __init__(self, model):
+        super().__init__(model)
+        width, height = model.floor.shape
+        robots = max(model.num_agents, 1)
+
+        # Regions of about the same size, a grid of rows x columns >= robots
+        rows = max(1, min(width, round(math.sqrt(robots * width / height))))
+        columns = max(1, min(height, math.ceil(robots / rows)))
+        xs = np.linspace(0, width, rows + 1).astype(int)
+        ys = np.linspace(0, height, columns + 1).astype(int)
+        regions = [(xs[row], xs[row + 1], ys[column], ys[column + 1])
+                   for row in range(rows) for column in range(columns)]
+
+        # The path of each robot: its regions (round robin), row by row
+        paths = [[] for _ in range(robots)]
+        for number, (x0, x1, y0, y1) in enumerate(regions):
+            cells = np.arange(x0, x1)[:, None] * height + np.arange(y0, y1)
+            cells[1::2] = cells[1::2, ::-1]
+            paths[number % robots].append(cells.ravel())
+        lengths = [sum(len(cells) for cells in path) for path in paths]
+        self.path = np.concatenate([cells for path in paths for cells in path])
+        self.end = np.cumsum(lengths)
+        self.pointer = self.end - lengths
+
+    def targets(self, robots):
+        '''
+            Moves the pointer of the robots to the next dirty cell of their
+            paths, returns the ones that still have a dirty cell.
+        '''
+        floor = self.model.floor.ravel()
+        window = np.arange(32)
+        pending = robots[self.pointer[robots] < self.end[robots]]
+        while len(pending) > 0:
+            cells = self.pointer[pending, None] + window
+            valid = cells < self.end[pending, None]
+            dirty = valid & (floor[self.path[np.minimum(cells,
+                                                        len(self.path) - 1)]]
+                             != 0)
+            found = dirty.any(axis=1)
+            self.pointer[pending] = np.where(
+                found, self.pointer[pending] + dirty.argmax(axis=1),
+                np.minimum(self.pointer[pending] + len(window),
+                           self.end[pending]))
+            pending = pending[~found & (self.pointer[pending] <
+                                        self.end[pending])]
+        return self.pointer[robots] < self.end[robots]
+
+    def moves(self, robots, positions):
+        active = self.targets(robots)
+        target = self.path[self.pointer[robots[active]]]
+        x, y = np.divmod(target, self.model.floor.shape[1])
+        new_positions = positions.copy()
+        new_positions[active] += np.sign(np.stack((x, y), axis=1) -
+                                         positions[active])
+        # The robots whose regions are clean walk at random
+        new_positions[~active] = self.random_moves(positions[~active])
+        return new_positions
+
+
+STRATEGIES = {"random": None, "nearest": NearestDirt, "sweep": Sweep}
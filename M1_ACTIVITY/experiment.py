@@ -0,0 +1,46 @@
+'''
+
+    TC2008B - M1 - Activity 1
+
+    Expected steps to clean the floor by number of robots and percentage of
+    dirty cells.
+
+    Runs seeded replicas of each configuration in a process pool until the
+    confidence interval of its mean is within RELATIVE_ERROR of the mean,
+    or the budget of replicas runs out (see COMMON/Experiment.py).
+
+'''
+
+from SYSTEM.Model import steps_to_clean
+from COMMON.Experiment import adaptive_experiment
+import time
+
+WIDTH_GRID = 20  # Width of the grid
+HEIGHT_GRID = 30  # Height of the grid
+NUM_ROBOTS = (5, 10, 20)  # Numbers of robots of the configurations
+DIRTY_CELLS_PERCENTAGES = (0.25, 0.5)  # Percentages of dirty cells
+STRATEGY = "random"  # Navigation of the robots: "random", "nearest" or "sweep"
+BUDGET = 2000  # Maximum number of replicas of the whole experiment
+RELATIVE_ERROR = 0.02  # Half width of the intervals, relative to the mean
+CONFIDENCE = 0.95  # Confidence of the intervals
+MINIMUM = 10  # Replicas of each configuration before checking it
+PROCESSES = None  # Processes of the pool (all the CPUs if None)
+SEED = 0  # Seed of the experiment
+
+if __name__ == "__main__":
+    start_time = time.time()
+    configurations = [
+        {"width": HEIGHT_GRID, "height": WIDTH_GRID, "num_agents": robots,
+         "dirty_cells_percentage": percentage, "strategy": STRATEGY}
+        for robots in NUM_ROBOTS for percentage in DIRTY_CELLS_PERCENTAGES]
+    stats = adaptive_experiment(steps_to_clean, configurations, BUDGET,
+                                RELATIVE_ERROR, CONFIDENCE, MINIMUM,
+                                PROCESSES, SEED)
+
+    print("Robots  Dirty  Replicas  Steps to clean")
+    for configuration, result in zip(configurations, stats):
+        print("%6d  %5.2f  %8d  %.1f +- %.1f" % (
+            configuration["num_agents"],
+            configuration["dirty_cells_percentage"], result.count,
+            result.mean, result.half_width(CONFIDENCE)))
+    print("Time of execution: %s seconds" % round(time.time() - start_time, 2))
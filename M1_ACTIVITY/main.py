@@ -10,42 +10,62 @@
 
 '''
 
-from SYSTEM.Model import RobotVacuumCleanerModel
+from SYSTEM.Model import RobotVacuumCleanerModel, get_state, load_checkpoint
+from SYSTEM.Ensemble import RobotVacuumEnsemble
+from COMMON.Animation import GifSink
+from COMMON.StopConditions import StopConditions, WallClock
+from COMMON.Checkpoint import CheckpointWriter
+import sys
 import time
-import matplotlib.animation as animation
-import matplotlib.pyplot as plt
 
 WIDTH_GRID = 20  # Width of the grid
 HEIGHT_GRID = 30  # Height of the grid
 NUM_ROBOTS = 10  # Number of robots
 DIRTY_CELLS_PERCENTAGE = 0.5  # Percentage of dirty cells in the grid
-MAX_STEPS = 200  # Time of execution maximum in seconds
+MAX_STEPS = 200  # Maximum number of steps
+TIME_BUDGET = 600  # Time of execution maximum in seconds
 FLAG_FINALIZED = False # Flag of the simulation is will finished completely
+VECTORIZED = False  # Step all the robots with NumPy arrays (large fleets)
+STRATEGY = "random"  # Navigation of the robots: "random", "nearest" or "sweep"
+REPLICAS = 0  # Independent worlds run at once, random walk and no animation (0 runs one model)
+PALETTE = {0: (0, 0, 0), 1: (127, 127, 127), 2: (255, 255, 255)}  # Cell colors
+CHECKPOINT = "checkpoint.npz"  # Checkpoint of the simulation (latest)
+CHECKPOINT_EVERY = 0  # Steps between two checkpoints (0 disabled)
+RESUME = False  # Resume the simulation from CHECKPOINT
 
 start_time = time.time()
-model = RobotVacuumCleanerModel(
-    HEIGHT_GRID, WIDTH_GRID, NUM_ROBOTS, DIRTY_CELLS_PERCENTAGE, FLAG_FINALIZED, MAX_STEPS)
+if REPLICAS > 0:
+    if STRATEGY != "random":
+        sys.exit("The replicas only run the random walk (STRATEGY = \"random\")")
+    ensemble = RobotVacuumEnsemble(
+        REPLICAS, HEIGHT_GRID, WIDTH_GRID, NUM_ROBOTS, DIRTY_CELLS_PERCENTAGE, FLAG_FINALIZED, MAX_STEPS)
+    ensemble.run()
+    ensemble.get_info()
+    print("Time of execution: %s seconds" % round(time.time() - start_time, 2))
+    sys.exit(0)
+
+animation = GifSink('Animation.gif', PALETTE, fps=10, scale=10)
+stop_conditions = StopConditions(WallClock(TIME_BUDGET))
+if RESUME:
+    model = load_checkpoint(CHECKPOINT, animation, stop_conditions)
+else:
+    model = RobotVacuumCleanerModel(
+        HEIGHT_GRID, WIDTH_GRID, NUM_ROBOTS, DIRTY_CELLS_PERCENTAGE, FLAG_FINALIZED, MAX_STEPS,
+        animation, stop_conditions=stop_conditions, vectorized=VECTORIZED,
+        strategy=STRATEGY)
+checkpoints = None
+if CHECKPOINT_EVERY > 0:
+    checkpoints = CheckpointWriter(CHECKPOINT, CHECKPOINT_EVERY, get_state)
 
 while not model.is_finalized():
     model.step()
-
+    if checkpoints is not None:
+        checkpoints.step(model, model.current_step)
+animation.close()
+if checkpoints is not None:
+    checkpoints.close()
 
 time_execution = time.time() - start_time
 
 model.get_info()
 print("Time of execution: %s seconds" % round(time_execution, 2))
-
-all_grids = model.datacollector.get_model_vars_dataframe()
-fig, axs = plt.subplots(figsize=(7, 7))
-axs.set_xticks([])
-axs.set_yticks([])
-patch = plt.imshow(all_grids.iloc[0][0], cmap="gray")
-
-
-def animate(i):
-    patch.set_data(all_grids.iloc[i][0])
-
-
-anim = animation.FuncAnimation(
-    fig, animate, frames=len(all_grids), interval=100)
-anim.save('Animation.gif', writer='imagemagick', fps=10)